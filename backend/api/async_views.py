@@ -0,0 +1,61 @@
+"""Асинхронные обёртки представлений для запуска под ASGI.
+
+DRF не поддерживает асинхронные представления, поэтому обёртка
+выполняет обычное представление в пуле потоков ограниченного размера.
+Каждый поток держит своё соединение с базой, так что размер пула
+ограничивает и число соединений процесса. Медленный клиент занимает
+только цикл событий, а не поток с соединением.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from core.timing import track_queries
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_POOL_SIZE, thread_name_prefix='db'
+)
+
+
+def run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        with track_queries(getattr(request, 'timing', None)):
+            response = view(request, *args, **kwargs)
+            # Рендерим здесь же, иначе Django сделает это в общем потоке
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(
+            run_view, view, request, *args, **kwargs
+        ))
+    return wrapper
+
+
+def async_patterns(patterns, names):
+    """Делает асинхронными представления маршрутов с именами из names.
+
+    Потоковые ответы сюда не подходят: Django читает их в цикле
+    событий, где обращаться к базе нельзя.
+    """
+    result = []
+    for pattern in patterns:
+        if pattern.name in names:
+            pattern = URLPattern(
+                pattern.pattern, async_view(pattern.callback),
+                pattern.default_args, pattern.name
+            )
+        result.append(pattern)
+    return result
@@ -0,0 +1,116 @@
+import copy
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+from core.constants import (
+    AUTH_TOKEN_CACHE_SIZE,
+    AUTH_TOKEN_CACHE_STATS_LOG_INTERVAL,
+    AUTH_TOKEN_CACHE_TTL,
+    AUTH_TOKEN_SHARED_CACHE_TTL
+)
+from core.lru import LRUCache
+
+logger = logging.getLogger('backends')
+
+
+class TokenCache:
+    """Пользователи по ключу токена: LRU процесса и, если задан, общий кеш.
+
+    Запись удаляется при удалении токена (выход через djoser, удаление
+    пользователя) и при сохранении пользователя (смена пароля,
+    деактивация). В своём процессе и в общем кеше это происходит
+    сразу, в LRU других процессов запись живёт не дольше ttl.
+    """
+
+    def __init__(self, maxsize=AUTH_TOKEN_CACHE_SIZE,
+                 ttl=AUTH_TOKEN_CACHE_TTL,
+                 log_interval=AUTH_TOKEN_CACHE_STATS_LOG_INTERVAL):
+        self.local = LRUCache(maxsize, ttl=ttl)
+        self.log_interval = log_interval
+        self.shared_hits = 0
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        alias = settings.AUTH_TOKEN_CACHE
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def make_key(key):
+        return f'auth-token:{key}'
+
+    def get(self, key):
+        user = self.local.get(key)
+        if user is None and self.shared is not None:
+            user = self.shared.get(self.make_key(key))
+            if user is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self.local.set(key, user)
+        self.log_stats()
+        return user
+
+    def set(self, key, user):
+        self.local.set(key, user)
+        if self.shared is not None:
+            self.shared.set(
+                self.make_key(key), user, AUTH_TOKEN_SHARED_CACHE_TTL
+            )
+
+    def forget(self, keys):
+        for key in keys:
+            self.local.pop(key)
+        if self.shared is not None:
+            self.shared.delete_many([self.make_key(key) for key in keys])
+
+    def log_stats(self):
+        stats = self.local.stats()
+        total = stats['hits'] + stats['misses']
+        if total and total % self.log_interval == 0:
+            logger.info(
+                'Кеш токенов: попаданий %s, из общего кеша %s, промахов %s',
+                stats['hits'], self.shared_hits,
+                stats['misses'] - self.shared_hits,
+                extra={
+                    'hit_rate': round(stats['hit_rate'], 3),
+                    'size': stats['size'],
+                }
+            )
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе для недавно виденных токенов.
+
+    Каждый запрос получает свою копию пользователя из кеша, чтобы
+    изменения в одном запросе не были видны в других. Снимок может
+    отставать от базы на время жизни записи, поэтому изменяющие запросы
+    (они могут сохранить пользователя целиком) читают его из базы.
+    """
+    use_cache = True
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key) if self.use_cache else None
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, copy.copy(user))
+            return user, token
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        user = copy.copy(user)
+        return user, self.get_model()(key=key, user=user)
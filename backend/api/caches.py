@@ -0,0 +1,78 @@
+import hashlib
+import logging
+import threading
+
+from django.core.cache import caches
+
+from core.constants import RECIPE_CACHE_ALIAS, RECIPE_CACHE_STATS_LOG_INTERVAL
+from core.versions import get_versions
+
+logger = logging.getLogger('views')
+
+
+class RecipePayloadCache:
+    """Кеш общей для всех пользователей части сериализованного рецепта.
+
+    Ключ записи включает версии рецепта, тегов и ингредиентов, поэтому
+    любое изменение, поднимающее версию (сохранение, удаление, правка
+    профиля автора), делает старую запись недостижимой. Счётчики
+    попаданий и промахов периодически пишутся в лог.
+    """
+
+    def __init__(self, alias=RECIPE_CACHE_ALIAS,
+                 log_interval=RECIPE_CACHE_STATS_LOG_INTERVAL):
+        self.alias = alias
+        self.log_interval = log_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_keys(self, recipe_ids, request=None, variant=''):
+        versions = get_versions(
+            [f'recipe:{pk}' for pk in recipe_ids] + ['tags', 'ingredients']
+        )
+        # В ответе абсолютные ссылки на изображения, они зависят от хоста
+        base_url = request.build_absolute_uri('/') if request else ''
+        common = (f'{base_url}:{variant}:{versions["tags"]}:'
+                  f'{versions["ingredients"]}')
+        return {
+            pk: 'recipe-payload:{}:{}'.format(pk, hashlib.md5(
+                f'{versions[f"recipe:{pk}"]}:{common}'.encode()
+            ).hexdigest())
+            for pk in recipe_ids
+        }
+
+    def get_many(self, recipe_ids, request=None, variant=''):
+        """Возвращает ключи записей и найденные в кеше данные по id."""
+        keys = self.make_keys(recipe_ids, request, variant)
+        found = self.cache.get_many(keys.values())
+        payloads = {
+            pk: found[key] for pk, key in keys.items() if key in found
+        }
+        self.record(len(payloads), len(keys) - len(payloads))
+        return keys, payloads
+
+    def set_many(self, payloads):
+        if payloads:
+            self.cache.set_many(payloads)
+
+    def record(self, hits, misses):
+        with self._lock:
+            total_before = self.hits + self.misses
+            self.hits += hits
+            self.misses += misses
+            total = self.hits + self.misses
+        if total // self.log_interval > total_before // self.log_interval:
+            logger.info('Кеш рецептов: попаданий %s, промахов %s',
+                        self.hits, self.misses)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+recipe_payload_cache = RecipePayloadCache()
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Кеши, содержимое которых видно только своему процессу
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии данных и сброс кешей в памяти работают через общий кеш."""
+    if settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        'Кеш default не общий для процессов.',
+        hint=(
+            'Изменения из management-команд и других воркеров не сбросят '
+            'кеши этого процесса. Укажите CACHE_BACKEND и CACHE_LOCATION '
+            'общего кеша (например, memcached).'
+        ),
+        id='api.W001',
+    )]
@@ -0,0 +1,55 @@
+"""Потоковая выгрузка списка покупок в разных форматах.
+
+Каждый экспортёр принимает итератор строк агрегата ингредиентов и
+отдаёт ответ частями, не собирая файл целиком в памяти.
+"""
+import csv
+import json
+
+SHOPPING_CART_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(items):
+    writer = csv.writer(Echo(), lineterminator='\n')
+    yield writer.writerow(SHOPPING_CART_HEADER)
+    for item in items:
+        yield writer.writerow((
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['total_amount']
+        ))
+
+
+def export_txt(items):
+    yield 'Список покупок\n\n'
+    for item in items:
+        yield (f'{item["ingredient__name"]} '
+               f'({item["ingredient__measurement_unit"]}) — '
+               f'{item["total_amount"]}\n')
+
+
+def export_json(items):
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps({
+            'name': item['ingredient__name'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+            'amount': item['total_amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+SHOPPING_CART_EXPORTS = {
+    'csv': (export_csv, 'text/csv; charset=utf-8'),
+    'txt': (export_txt, 'text/plain; charset=utf-8'),
+    'json': (export_json, 'application/json; charset=utf-8'),
+}
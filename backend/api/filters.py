@@ -1,7 +1,10 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 from rest_framework.filters import SearchFilter
 
 from recipes.models import Recipe, UserFavourite, UserShoppingCart
+from recipes.search import search_recipes
+from recipes.tag_slugs import tag_slugs
 
 
 class IngredientSearchFilter(SearchFilter):
@@ -16,12 +19,31 @@ class RecipeFilter(filters.FilterSet):
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(
+        choices=lambda: tag_slugs.choices(), method='filter_tags'
+    )
     author = filters.NumberFilter(field_name='author__id')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'tags', 'author')
+        fields = (
+            'is_favorited', 'is_in_shopping_cart', 'tags', 'author', 'search'
+        )
+
+    def filter_tags(self, queryset, name, value):
+        # EXISTS вместо JOIN: рецепт с несколькими тегами не дублируется
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag_id__in=tag_slugs.ids(value)
+        )))
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
 
     def filter_is_favorited(self, queryset, name, value):
         if not self.request.user.is_authenticated:
@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+# Общие кеши подменяются локальными, чтобы запросы доходили до базы
+# и замеры не затрагивали кеш работающего приложения
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-commands',
+    },
+    'recipes': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+
+@contextmanager
+def local_api():
+    with override_settings(ALLOWED_HOSTS=['*'], CACHES=LOCAL_CACHES):
+        yield
+
+
+def call_api(user, method, url, data=None):
+    """Выполняет запрос к API, возвращает ответ и выполненные SQL-запросы.
+
+    Потоковый ответ читается целиком, чтобы учесть и его запросы.
+    """
+    client = APIClient()
+    client.force_authenticate(user)
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return response, context.captured_queries
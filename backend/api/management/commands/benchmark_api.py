@@ -0,0 +1,179 @@
+import base64
+import json
+import time
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from api.management.commands._api import call_api, local_api
+from core.constants import DEFAULT_PAGE_SIZE
+from recipes.models import Ingredient, Recipe, Tag, UserShoppingCart
+
+User = get_user_model()
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = round(percent / 100 * (len(values) - 1))
+    return values[index]
+
+
+def sample_image():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), 'white').save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+class Command(BaseCommand):
+    help = ('Замер задержки (перцентили) и числа SQL-запросов основных '
+            'эндпоинтов API на заполненной базе, например после '
+            'generate_fake_data. Результат сохраняется в JSON и может '
+            'сравниваться с сохранённым ранее. Изменения данных '
+            'откатываются после замера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество замеров каждого запроса'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=2,
+            help='Количество запросов перед замером'
+        )
+        parser.add_argument(
+            '--output',
+            help='Сохранить результат в JSON-файл'
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON-файл с прошлым результатом для сравнения'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост медианы задержки, доля от прошлой'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            results = self.measure(options['repeat'], options['warmup'])
+            transaction.set_rollback(True)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<32} запросов: {result["queries"]:>3}  '
+                + '  '.join(
+                    f'p{percent}: {result[f"p{percent}_ms"]:.1f} мс'
+                    for percent in PERCENTILES
+                )
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def scenarios(self):
+        """Запросы для замера: (название, пользователь, метод, url, данные)."""
+        reader = User.objects.order_by('-subscription_count').first()
+        buyer = User.objects.filter(
+            pk__in=UserShoppingCart.objects.values('user')[:1]
+        ).first()
+        author = User.objects.order_by('-recipe_count').first()
+        recipe = Recipe.objects.filter(author=author).order_by('-id').first()
+        tags = list(Tag.objects.values_list('slug', flat=True)[:3])
+        ingredients = list(Ingredient.objects.order_by('id')[:3])
+        if not (reader and buyer and recipe and tags and ingredients):
+            raise CommandError('Заполните базу данными для замера')
+        tag_query = '&'.join(f'tags={slug}' for slug in tags)
+        middle_page = Recipe.objects.count() // (2 * DEFAULT_PAGE_SIZE) + 1
+        payload = {
+            'name': 'Замер',
+            'text': 'Рецепт для замера производительности',
+            'cooking_time': 10,
+            'image': sample_image(),
+            'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 100}
+                for ingredient in ingredients
+            ],
+        }
+        return [
+            ('recipes', None, 'get', '/api/recipes/', None),
+            ('recipes_middle_page', None, 'get',
+             f'/api/recipes/?page={middle_page}', None),
+            ('recipes_cursor', None, 'get',
+             '/api/recipes/?pagination=cursor', None),
+            ('recipes_author', None, 'get',
+             f'/api/recipes/?author={author.pk}', None),
+            ('recipes_tags', None, 'get', f'/api/recipes/?{tag_query}', None),
+            ('recipes_search', None, 'get',
+             f'/api/recipes/?search={ingredients[0].name}', None),
+            ('recipes_authenticated', reader, 'get', '/api/recipes/', None),
+            ('recipes_favorited', reader, 'get',
+             '/api/recipes/?is_favorited=1', None),
+            ('recipes_in_shopping_cart', buyer, 'get',
+             '/api/recipes/?is_in_shopping_cart=1', None),
+            ('recipe_detail', reader, 'get',
+             f'/api/recipes/{recipe.pk}/', None),
+            ('ingredients_search', None, 'get',
+             f'/api/ingredients/?name={ingredients[0].name[:3]}', None),
+            ('subscriptions', reader, 'get',
+             '/api/users/subscriptions/?recipes_limit=3', None),
+            ('download_shopping_cart', buyer, 'get',
+             '/api/recipes/download_shopping_cart/', None),
+            ('recipe_create', author, 'post', '/api/recipes/', payload),
+            ('recipe_update', author, 'patch',
+             f'/api/recipes/{recipe.pk}/', payload),
+        ]
+
+    def measure(self, repeat, warmup):
+        results = {}
+        with local_api():
+            for name, user, method, url, data in self.scenarios():
+                timings = []
+                for number in range(warmup + repeat):
+                    start = time.perf_counter()
+                    response, queries = call_api(user, method, url, data)
+                    elapsed = time.perf_counter() - start
+                    if response.status_code >= 400:
+                        raise CommandError(
+                            f'{name}: {response.status_code} '
+                            f'{getattr(response, "data", "")}'
+                        )
+                    if number >= warmup:
+                        timings.append(elapsed * 1000)
+                results[name] = {'queries': len(queries)}
+                results[name].update(
+                    (f'p{percent}_ms', round(percentile(timings, percent), 2))
+                    for percent in PERCENTILES
+                )
+        return results
+
+    def compare(self, results, path, threshold):
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result['p50_ms'] > previous['p50_ms'] * (1 + threshold):
+                regressions.append(
+                    f'{name}: медиана {previous["p50_ms"]:.1f} → '
+                    f'{result["p50_ms"]:.1f} мс'
+                )
+            if result['queries'] > previous['queries']:
+                regressions.append(
+                    f'{name}: запросов {previous["queries"]} → '
+                    f'{result["queries"]}'
+                )
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,93 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from core.constants import MAX_PAGE_SIZE
+from recipes.models import Recipe
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Замер времени и числа запросов /api/users/subscriptions/ '
+            'при разном количестве подписок. Данные создаются в '
+            'транзакции и откатываются после замера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=[10, 100, 1000],
+            help='Количество подписок для замеров'
+        )
+        parser.add_argument(
+            '--recipes-per-author', type=int, default=5,
+            help='Количество рецептов у каждого автора'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Количество повторов запроса для каждого замера'
+        )
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            with transaction.atomic():
+                queries, timings = self.measure(
+                    size, options['recipes_per_author'], options['repeat']
+                )
+                transaction.set_rollback(True)
+            self.stdout.write(
+                f'подписок: {size:>6}  запросов: {queries:>3}  '
+                f'медиана: {statistics.median(timings) * 1000:.1f} мс  '
+                f'максимум: {max(timings) * 1000:.1f} мс'
+            )
+
+    def measure(self, size, recipes_per_author, repeat):
+        subscriber = User.objects.create_user(
+            email='bench-subscriber@example.com',
+            username='bench-subscriber',
+            first_name='bench',
+            last_name='bench',
+        )
+        User.objects.bulk_create(
+            User(
+                email=f'bench-author-{number}@example.com',
+                username=f'bench-author-{number}',
+                first_name='bench',
+                last_name='bench',
+            )
+            for number in range(size)
+        )
+        authors = User.objects.filter(username__startswith='bench-author-')
+        Recipe.objects.bulk_create(
+            Recipe(
+                name=f'bench {author.pk}-{number}',
+                text='bench',
+                cooking_time=1,
+                image='recipes/images/bench.png',
+                author=author,
+            )
+            for author in authors
+            for number in range(recipes_per_author)
+        )
+        Subscription.objects.bulk_create(
+            Subscription(subscriber=subscriber, subscribed_to=author)
+            for author in authors
+        )
+        client = APIClient()
+        client.force_authenticate(subscriber)
+        url = (f'/api/users/subscriptions/'
+               f'?limit={MAX_PAGE_SIZE}&recipes_limit=3')
+        timings = []
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as context:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.content
+        return len(context), timings
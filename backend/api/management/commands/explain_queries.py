@@ -0,0 +1,111 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.management.commands._api import call_api, local_api
+from recipes.models import Ingredient, Recipe, Tag, UserShoppingCart
+
+User = get_user_model()
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+class Command(BaseCommand):
+    help = ('Проверка планов основных запросов API через EXPLAIN: '
+            'завершается ошибкой, если запрос читает большую таблицу '
+            'последовательным сканированием. Запускайте на базе, '
+            'заполненной данными, например после generate_fake_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows', type=int, default=10000,
+            help='Размер таблицы, начиная с которого Seq Scan — ошибка'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Проверка планов работает только с PostgreSQL')
+        sizes = self.table_sizes()
+        failures = []
+        with transaction.atomic():
+            for url, user, sql in self.capture_queries():
+                for table in self.seq_scans(sql):
+                    if sizes.get(table, 0) >= options['min_rows']:
+                        failures.append((url, user, table, sql))
+            transaction.set_rollback(True)
+        for url, user, table, sql in failures:
+            self.stdout.write(self.style.ERROR(
+                f'{url} (пользователь {user}): Seq Scan по {table}\n  {sql}'
+            ))
+        if failures:
+            raise CommandError(
+                f'Последовательное сканирование больших таблиц: '
+                f'{len(failures)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Последовательного сканирования больших таблиц нет'
+        ))
+
+    @staticmethod
+    def table_sizes():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'"
+            )
+            return dict(cursor.fetchall())
+
+    @staticmethod
+    def seq_scans(sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return {
+            node['Relation Name'] for node in plan_nodes(plan[0]['Plan'])
+            if node['Node Type'] == 'Seq Scan'
+        }
+
+    def endpoints(self):
+        """Запросы к API от имени самого активного пользователя."""
+        user = User.objects.order_by('-subscription_count').first()
+        buyer = User.objects.filter(
+            pk__in=UserShoppingCart.objects.values('user')[:1]
+        ).first()
+        recipe = Recipe.objects.order_by('-favourite_count').first()
+        tags = Tag.objects.values_list('slug', flat=True)[:3]
+        ingredient = Ingredient.objects.first()
+        if not (user and recipe and ingredient):
+            raise CommandError('Заполните базу данными для проверки')
+        tag_query = '&'.join(f'tags={slug}' for slug in tags)
+        return [
+            (None, '/api/recipes/'),
+            (None, '/api/recipes/?count=exact&page=50'),
+            (None, f'/api/recipes/?author={recipe.author_id}'),
+            (None, f'/api/recipes/?{tag_query}'),
+            (None, f'/api/recipes/?search={ingredient.name}'),
+            (None, f'/api/recipes/{recipe.pk}/'),
+            (None, f'/api/users/{recipe.author_id}/'),
+            (user, '/api/recipes/'),
+            (user, '/api/recipes/?is_favorited=1'),
+            (user, '/api/users/subscriptions/?recipes_limit=3'),
+            (buyer, '/api/recipes/?is_in_shopping_cart=1'),
+            (buyer, '/api/recipes/download_shopping_cart/'),
+        ]
+
+    def capture_queries(self):
+        with local_api():
+            for user, url in self.endpoints():
+                response, queries = call_api(user, 'get', url)
+                if response.status_code >= 500:
+                    raise CommandError(f'{url}: {response.status_code}')
+                for query in queries:
+                    sql = query['sql']
+                    if sql.lstrip().upper().startswith('SELECT'):
+                        yield url, user, sql
@@ -0,0 +1,160 @@
+import http.client
+import json
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.commands.benchmark_api import percentile
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=20&page=3',
+    '/api/tags/',
+    '/api/ingredients/?name=мо',
+)
+
+
+def process_memory(pids):
+    """Суммарный RSS процессов в мегабайтах (Linux)."""
+    total = 0
+    for pid in pids:
+        with open(f'/proc/{pid}/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1])
+    return round(total / 1024, 1)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест запущенного сервера: несколько клиентов с '
+            'keep-alive соединениями запрашивают эндпоинты чтения, '
+            'результат — пропускная способность и перцентили задержки. '
+            'Для сравнения режимов запустите сервер с SERVER_MODE=wsgi и '
+            'SERVER_MODE=asgi при одинаковом лимите памяти, сохраните '
+            'результаты через --output и сравните их через --compare.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', default='http://localhost:8000',
+            help='Адрес сервера'
+        )
+        parser.add_argument(
+            '--paths', nargs='+', default=DEFAULT_PATHS,
+            help='Запрашиваемые пути, клиенты проходят их по кругу'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=50,
+            help='Количество одновременных клиентов'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Длительность теста в секундах'
+        )
+        parser.add_argument(
+            '--pids', nargs='*', type=int, default=(),
+            help='Процессы сервера для замера потребляемой памяти'
+        )
+        parser.add_argument(
+            '--label', default='',
+            help='Название прогона, например wsgi или asgi'
+        )
+        parser.add_argument(
+            '--output',
+            help='Сохранить результат в JSON-файл'
+        )
+        parser.add_argument(
+            '--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+            help='Сравнить два сохранённых результата и выйти'
+        )
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            self.compare(*options['compare'])
+            return
+        result = self.run(options)
+        self.report(result)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+
+    def run(self, options):
+        url = urlsplit(options['url'])
+        deadline = time.monotonic() + options['duration']
+        timings, errors = [], []
+        lock = threading.Lock()
+
+        def client(offset):
+            connection = http.client.HTTPConnection(url.netloc, timeout=30)
+            paths = [quote(path, safe='/?=&%') for path in options['paths']]
+            number = offset
+            local_timings, local_errors = [], 0
+            while time.monotonic() < deadline:
+                path = paths[number % len(paths)]
+                number += 1
+                start = time.perf_counter()
+                try:
+                    connection.request('GET', path)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    local_errors += 1
+                    connection.close()
+                    continue
+                local_timings.append((time.perf_counter() - start) * 1000)
+                if response.status >= 400:
+                    local_errors += 1
+            connection.close()
+            with lock:
+                timings.extend(local_timings)
+                errors.append(local_errors)
+
+        threads = [
+            threading.Thread(target=client, args=(offset,))
+            for offset in range(options['concurrency'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        memory = None
+        if options['pids']:
+            # Память замеряется под нагрузкой, в середине теста
+            time.sleep(options['duration'] / 2)
+            memory = process_memory(options['pids'])
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        if not timings:
+            raise CommandError('Сервер не ответил ни на один запрос')
+        return {
+            'label': options['label'],
+            'concurrency': options['concurrency'],
+            'requests': len(timings),
+            'errors': sum(errors),
+            'rps': round(len(timings) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 50), 1),
+            'p99_ms': round(percentile(timings, 99), 1),
+            'memory_mb': memory,
+        }
+
+    def report(self, result):
+        self.stdout.write(
+            f'{result["label"] or "прогон"}: {result["rps"]} запр/с, '
+            f'p50 {result["p50_ms"]} мс, p99 {result["p99_ms"]} мс, '
+            f'запросов {result["requests"]}, ошибок {result["errors"]}, '
+            f'память {result["memory_mb"] or "—"} МБ'
+        )
+
+    def compare(self, before_path, after_path):
+        results = []
+        for path in (before_path, after_path):
+            with open(path, encoding='utf-8') as file:
+                results.append(json.load(file))
+        for result in results:
+            self.report(result)
+        before, after = results
+        self.stdout.write(
+            f'Пропускная способность: x{after["rps"] / before["rps"]:.2f}, '
+            f'p99: x{after["p99_ms"] / before["p99_ms"]:.2f}'
+        )
@@ -0,0 +1,83 @@
+import hashlib
+
+from django.db.models import BigIntegerField
+from django.http import Http404
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.versions import get_versions
+
+
+def make_etag(parts):
+    return quote_etag(hashlib.md5('\n'.join(parts).encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы для list и retrieve.
+
+    ETag строится из версий данных (core.versions) до сериализации,
+    поэтому на совпавший If-None-Match ответ 304 отдаётся без обращения
+    к сериализаторам. Наследник задаёт ключи версий в get_version_keys.
+    """
+    etag_vary_on_user = False
+
+    def get_version_keys(self):
+        raise NotImplementedError
+
+    def get_lookup_pk(self):
+        """pk объекта из URL; 404, если это не id или объекта нет.
+
+        Проверяется до чтения версий: версия создаётся в общем кеше при
+        первом чтении, и произвольный pk из URL не должен давать ключей.
+        """
+        try:
+            pk = int(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        except ValueError:
+            raise Http404
+        if not 0 < pk <= BigIntegerField.MAX_BIGINT:
+            raise Http404
+        if not self.object_exists(pk):
+            raise Http404
+        return pk
+
+    def object_exists(self, pk):
+        return self.queryset.filter(pk=pk).exists()
+
+    def get_etag(self, request):
+        versions = get_versions(self.get_version_keys())
+        parts = [f'{key}={value}' for key, value in sorted(versions.items())]
+        if self.action == 'list':
+            parts.append(request.get_full_path())
+        if self.etag_vary_on_user:
+            parts.append(f'user={request.user.pk}')
+        return make_etag(parts)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            response['ETag'] = etag
+            if self.etag_vary_on_user:
+                patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
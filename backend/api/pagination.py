@@ -1,13 +1,174 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from collections import OrderedDict
+
+from django.core.paginator import (
+    EmptyPage,
+    Page,
+    PageNotAnInteger,
+    Paginator,
+)
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
 
 from core.constants import (
+    COUNT_ESTIMATE,
+    COUNT_EXACT,
+    COUNT_NONE,
+    COUNT_QUERY_PARAM,
+    CURSOR_QUERY_PARAM,
     DEFAULT_PAGE_SIZE,
     MAX_PAGE_SIZE,
-    PAGE_SIZE_QUERY_PARAM
+    PAGE_SIZE_QUERY_PARAM,
+    PAGINATION_CURSOR,
+    PAGINATION_QUERY_PARAM
 )
 
 
+def estimate_count(queryset):
+    """Оценка числа строк по плану запроса Postgres.
+
+    Возвращает None, если оценку получить нельзя.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+class NoCountPage(Page):
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class NoCountPaginator(Paginator):
+    """Пагинатор без COUNT(*).
+
+    Наличие следующей страницы определяется по одной лишней строке.
+    """
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть целым числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На странице нет результатов')
+        return NoCountPage(
+            rows[:self.per_page], number, self,
+            has_next=len(rows) > self.per_page
+        )
+
+
+class EstimatedCountPaginator(NoCountPaginator):
+    """Пагинатор, который сообщает оценку числа строк от планировщика.
+
+    Оценка может заметно расходиться с реальным числом строк, поэтому
+    страницы и ссылки на соседние строятся как в NoCountPaginator, а
+    оценка только отдаётся в поле count.
+    """
+
+    @cached_property
+    def estimated_count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None:
+            return self.count
+        return estimate
+
+
 class CustomPagination(PageNumberPagination):
     page_size = DEFAULT_PAGE_SIZE
     page_size_query_param = PAGE_SIZE_QUERY_PARAM
     max_page_size = MAX_PAGE_SIZE
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Пагинация по ключу -id, устойчивая к вставке новых рецептов."""
+    ordering = '-id'
+    cursor_query_param = CURSOR_QUERY_PARAM
+    page_size = DEFAULT_PAGE_SIZE
+    page_size_query_param = PAGE_SIZE_QUERY_PARAM
+    max_page_size = MAX_PAGE_SIZE
+
+
+class RecipePagination(CustomPagination):
+    """Пагинация ленты рецептов.
+
+    По умолчанию работает постранично, как CustomPagination. Параметр
+    count=estimate заменяет COUNT(*) оценкой планировщика, count=none
+    отключает подсчёт. Режим курсора включается параметром
+    pagination=cursor или наличием параметра cursor.
+    """
+    cursor_pagination_class = RecipeCursorPagination
+    count_paginator_classes = {
+        COUNT_EXACT: Paginator,
+        COUNT_ESTIMATE: EstimatedCountPaginator,
+        COUNT_NONE: NoCountPaginator,
+    }
+
+    def is_cursor_mode(self, request):
+        return (
+            request.query_params.get(PAGINATION_QUERY_PARAM)
+            == PAGINATION_CURSOR
+            or CURSOR_QUERY_PARAM in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.is_cursor_mode(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.count_mode = request.query_params.get(COUNT_QUERY_PARAM)
+        if self.count_mode not in self.count_paginator_classes:
+            self.count_mode = COUNT_EXACT
+        self.django_paginator_class = self.count_paginator_classes[
+            self.count_mode
+        ]
+        page = super().paginate_queryset(queryset, request, view)
+        # Без точного количества неизвестно число страниц для навигации
+        if self.count_mode != COUNT_EXACT:
+            self.display_page_controls = False
+        return page
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        count = None
+        if self.count_mode == COUNT_ESTIMATE:
+            count = self.page.paginator.estimated_count
+        elif self.count_mode == COUNT_EXACT:
+            count = self.page.paginator.count
+        return Response(OrderedDict([
+            ('count', count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count']['nullable'] = True
+        return response_schema
@@ -1,17 +1,31 @@
 import base64
 import logging
+from collections import OrderedDict
 
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from drf_base64.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.caches import recipe_payload_cache
 from api.validators import username_by_path_me, username_by_pattern
-from core.constants import MAX_LENGTH_EMAIL, MAX_LENGTH_USERS_CHAR
+from core.constants import (
+    BULK_MAX_IDS,
+    IMAGE_VARIANT_CARD,
+    IMAGE_VARIANT_FULL,
+    IMAGE_VARIANT_THUMBNAIL,
+    MAX_LENGTH_EMAIL,
+    MAX_LENGTH_USERS_CHAR
+)
+from recipes import shopping_cart
+from recipes.images import variant_name
 from recipes.models import (
     Ingredient,
     Recipe,
     RecipeIngredient,
+    ShoppingCartIngredient,
     Tag,
     UserFavourite,
     UserShoppingCart
@@ -23,6 +37,50 @@ User = get_user_model()
 logger = logging.getLogger('serializers')
 
 
+def absolute_url(url, request=None):
+    """Абсолютная ссылка на файл.
+
+    Адрес сайта вычисляется один раз на запрос, а не для каждого
+    изображения и аватара в ответе.
+    """
+    if request is None or not url.startswith('/') or url.startswith('//'):
+        return url
+    base_uri = getattr(request, 'base_uri', None)
+    if base_uri is None:
+        base_uri = request.base_uri = request.build_absolute_uri('/')[:-1]
+    return base_uri + url
+
+
+def mark_subscribed(users, request):
+    """Проставляет пользователям is_subscribed одним запросом на всех.
+
+    Пропускает пользователей, у которых флаг уже вычислен аннотацией.
+    """
+    users = [
+        user for user in users if getattr(user, 'is_subscribed', None) is None
+    ]
+    if not users:
+        return
+    subscribed = set()
+    if request and request.user.is_authenticated:
+        subscribed = set(Subscription.objects.filter(
+            subscriber=request.user,
+            subscribed_to__in={user.pk for user in users}
+        ).values_list('subscribed_to_id', flat=True))
+    for user in users:
+        user.is_subscribed = user.pk in subscribed
+
+
+class UserListSerializer(serializers.ListSerializer):
+    """Вычисляет подписку на всех пользователей страницы одним запросом"""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        users = list(iterable)
+        mark_subscribed(users, self.context.get('request'))
+        return super().to_representation(users)
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Сериализатор для автора"""
     is_subscribed = serializers.SerializerMethodField()
@@ -39,20 +97,25 @@ class UserSerializer(serializers.ModelSerializer):
             'is_subscribed',
             'avatar'
         )
+        list_serializer_class = UserListSerializer
 
     def get_is_subscribed(self, obj):
+        # Значение могло быть заранее вычислено аннотацией в queryset
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         request = self.context.get('request')
         logger.info('Проверка на подписку')
-        if request and request.user.is_authenticated:
+        # На себя подписаться нельзя, запрос к базе не нужен
+        if request and request.user.is_authenticated and (
+            obj.pk != request.user.pk
+        ):
             return obj.subscribers.filter(subscriber=request.user).exists()
         return False
 
     def get_avatar(self, obj):
         if obj.avatar and hasattr(obj.avatar, 'url'):
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.avatar.url)
-            return obj.avatar.url
+            return absolute_url(obj.avatar.url, self.context.get('request'))
         return None
 
 
@@ -134,11 +197,35 @@ class AvatarSerializer(serializers.ModelSerializer):
         file_name = f"{instance.username}_avatar.{ext}"
         data = ContentFile(base64.b64decode(imgstr), name=file_name)
 
+        old_avatar = instance.avatar.name
         instance.avatar = data
         instance.save()
+        if old_avatar:
+            # Сохранение добавило ссылку на новый файл, снимаем ссылку на
+            # старый, даже если это тот же файл; файл удалится, только
+            # если на него никто больше не ссылается
+            instance.avatar.storage.delete(old_avatar)
         return instance
 
 
+def image_url(recipe, variant, request=None):
+    url = recipe.image.storage.url(variant_name(recipe, variant))
+    return absolute_url(url, request)
+
+
+class ImageVariantField(serializers.Field):
+    """Ссылка на уменьшенную копию изображения рецепта"""
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return image_url(value, self.variant, self.context.get('request'))
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для получения списка ингредиентов"""
     class Meta:
@@ -163,19 +250,10 @@ class IngredientInRecipeSerializer(serializers.Serializer):
 
 class RecipeIngredientReadSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения ингредиентов в ответе"""
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient',
-        read_only=True
-    )
-    name = serializers.SlugRelatedField(
-        source='ingredient',
-        slug_field='name',
-        read_only=True
-    )
-    measurement_unit = serializers.SlugRelatedField(
-        source='ingredient',
-        slug_field='measurement_unit',
-        read_only=True
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
     )
 
     class Meta:
@@ -259,12 +337,13 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
             for ingredient_data in ingredients_data
         ]
-        logger.info(f'Ингредиенты {ingredient_objects}')
+        logger.debug('Ингредиенты %s', ingredient_objects)
         RecipeIngredient.objects.bulk_create(ingredient_objects)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
-        logger.info(f'Ингредиенты {ingredients_data}')
+        logger.debug('Ингредиенты %s', ingredients_data)
         tags_data = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
 
@@ -273,27 +352,53 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients', None)
         tags_data = validated_data.pop('tags', None)
+        old_image = instance.image.name
+        image_changed = 'image' in validated_data
         instance = super().update(instance, validated_data)
+        if image_changed and old_image:
+            transaction.on_commit(
+                lambda: instance.image.storage.delete(old_image)
+            )
 
         if tags_data is not None:
             instance.tags.set(tags_data)
 
         if ingredients_data is not None:
+            old_amounts = dict(instance.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            ))
             instance.recipe_ingredients.all().delete()
             self.create_or_update_ingredients(instance, ingredients_data)
+            shopping_cart.recipe_ingredients_changed(instance.pk, old_amounts)
 
-        instance.save()
         return instance
 
     def to_representation(self, instance):
         return RecipeReadSerializer(instance, context=self.context).data
 
 
+class RecipeListSerializer(serializers.ListSerializer):
+    """Сериализует страницу рецептов одним пакетом обращений к кешу"""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        return self.child.to_representation_many(list(iterable))
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
     """Сериализатор для отображения рецепта"""
+    user_fields = ('is_favorited', 'is_in_shopping_cart')
+    prefetch_lookups = (
+        'tags',
+        Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredient')
+        ),
+    )
     tags = TagSerializer(many=True)
     author = UserSerializer()
     ingredients = RecipeIngredientReadSerializer(
@@ -302,7 +407,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = serializers.ImageField(use_url=True)
+    image = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -318,14 +423,106 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'text',
             'cooking_time'
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, recipes):
+        """Сериализует рецепты, беря общую часть из кеша.
+
+        Связанные объекты догружаются только для рецептов, которых не
+        оказалось в кеше.
+        """
+        request = self.context.get('request')
+        keys, payloads = recipe_payload_cache.get_many(
+            [recipe.pk for recipe in recipes], request,
+            variant=self.get_image_variant()
+        )
+        misses = [recipe for recipe in recipes if recipe.pk not in payloads]
+        self.mark_author_subscribed(recipes)
+        if misses:
+            prefetch_related_objects(misses, *self.prefetch_lookups)
+            fresh = {}
+            for recipe in misses:
+                payloads[recipe.pk] = self.shared_representation(recipe)
+                fresh[keys[recipe.pk]] = payloads[recipe.pk]
+            recipe_payload_cache.set_many(fresh)
+        return [
+            self.add_user_fields(payloads[recipe.pk], recipe)
+            for recipe in recipes
+        ]
+
+    def mark_author_subscribed(self, recipes):
+        """Флаг подписки на авторов без аннотации — одним запросом."""
+        recipes = [
+            recipe for recipe in recipes
+            if getattr(recipe, 'author_is_subscribed', None) is None
+        ]
+        if not recipes:
+            return
+        authors = [recipe.author for recipe in recipes]
+        mark_subscribed(authors, self.context.get('request'))
+        for recipe, author in zip(recipes, authors):
+            recipe.author_is_subscribed = author.is_subscribed
+
+    def shared_representation(self, instance):
+        """Часть рецепта, одинаковая для всех пользователей.
+
+        Пользовательские флаги сохраняются пустыми, чтобы не менять
+        порядок полей, и заполняются в add_user_fields.
+        """
+        instance.author.is_subscribed = self.get_author_is_subscribed(
+            instance
+        )
+        data = super().to_representation(instance)
+        for field in self.user_fields:
+            data[field] = None
+        data['author']['is_subscribed'] = None
+        return data
+
+    def add_user_fields(self, payload, instance):
+        data = OrderedDict(payload)
+        for field in self.user_fields:
+            data[field] = getattr(self, f'get_{field}')(instance)
+        data['author'] = OrderedDict(data['author'])
+        data['author']['is_subscribed'] = self.get_author_is_subscribed(
+            instance
+        )
+        return data
+
+    def get_image_variant(self):
+        # В списках достаточно карточки, на странице рецепта нужна копия
+        # полного размера
+        if isinstance(self.parent, serializers.ListSerializer):
+            return IMAGE_VARIANT_CARD
+        return IMAGE_VARIANT_FULL
+
+    def get_image(self, obj):
+        return image_url(
+            obj, self.get_image_variant(), self.context.get('request')
+        )
+
+    def get_author_is_subscribed(self, obj):
+        # Флаг подписки на автора приходит аннотацией рецепта
+        is_subscribed = getattr(obj, 'author_is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
+        return self.fields['author'].get_is_subscribed(obj.author)
 
     def get_is_favorited(self, obj):
+        is_favorited = getattr(obj, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.user_favourite.filter(user=request.user).exists()
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        is_in_shopping_cart = getattr(obj, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.user_shopping_cart.filter(user=request.user).exists()
@@ -359,11 +556,30 @@ class UserFavouriteSerializer(serializers.ModelSerializer):
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     """Сериализатор для коротких ссылок"""
+    image = ImageVariantField(IMAGE_VARIANT_THUMBNAIL)
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
 
+class SubscribedUserSerializer(UserSerializer):
+    """Сериализатор автора в списке подписок.
+
+    Ожидает рецепты, предзагруженные в атрибут latest_recipes.
+    """
+    recipes = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(
+        source='recipe_count', read_only=True
+    )
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count')
+
+    def get_recipes(self, obj):
+        return RecipeShortSerializer(obj.latest_recipes, many=True).data
+
+
 class UserShoppingCartSerializer(serializers.ModelSerializer):
     """Сериализатор для корзины покупок"""
     class Meta:
@@ -381,6 +597,19 @@ class UserShoppingCartSerializer(serializers.ModelSerializer):
         return data
 
 
+class ShoppingCartIngredientSerializer(serializers.ModelSerializer):
+    """Сериализатор итогов корзины покупок"""
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingCartIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Сериализаор для подписок на пользователей"""
     class Meta:
@@ -400,3 +629,15 @@ class SubscriptionSerializer(serializers.ModelSerializer):
                 {'detail': 'Вы уже подписаны на этого пользователя.'}
             )
         return data
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для массовых эндпоинтов; повторы отбрасываются"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS,
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+
+User = get_user_model()
+
+
+def forget_tokens(keys):
+    # Повтор после коммита убирает снимок, который параллельный запрос
+    # мог успеть прочитать из базы до коммита
+    keys = list(keys)
+    token_cache.forget(keys)
+    transaction.on_commit(lambda: token_cache.forget(keys))
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, update_fields, **kwargs):
+    # Смена пароля, деактивация и правка профиля меняют снимок в кеше
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    forget_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
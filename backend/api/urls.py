@@ -1,12 +1,14 @@
 from django.conf import settings
 from django.conf.urls.static import static
-from django.urls import include, path
+from django.urls import include, path, re_path
 from rest_framework.routers import DefaultRouter
 
+from api.async_views import async_patterns, async_view
 from api.views import (
     AvatarUpdateView,
     UserViewSet,
     IngredientViewSet,
+    ReadinessView,
     RecipeViewSet,
     ShortLinkRedirectView,
     TagViewSet
@@ -20,14 +22,24 @@ router.register(r'tags', TagViewSet, basename='tags')
 router.register(r'users', UserViewSet)
 router.register(r'recipes', RecipeViewSet, basename='recipes')
 
+router_urls = router.urls
+short_link_view = ShortLinkRedirectView.as_view()
+if settings.ASYNC_VIEWS:
+    router_urls = async_patterns(router_urls, {
+        f'{basename}-{route}'
+        for basename in ('ingredients', 'tags', 'recipes')
+        for route in ('list', 'detail')
+    })
+    short_link_view = async_view(short_link_view)
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
     path('users/me/avatar/', AvatarUpdateView.as_view(), name='avatar-update'),
+    re_path(r'^health/ready/?$', ReadinessView.as_view(), name='health-ready'),
     path('s/<str:short_code>/',
-         ShortLinkRedirectView.as_view(),
+         short_link_view,
          name='short-link-redirect'),
 ]
 
@@ -1,48 +1,82 @@
-import base64
-import csv
 import logging
-import os
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+)
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import Http404, HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from api.exports import SHOPPING_CART_EXPORTS
 from api.filters import IngredientSearchFilter, RecipeFilter
-from api.pagination import CustomPagination
+from api.mixins import ConditionalGetMixin, etag_matches, make_etag
+from api.pagination import CustomPagination, RecipePagination
 from api.permissions import IsAuthor
 from api.serializers import (
     AvatarSerializer,
+    BulkIdsSerializer,
     IngredientSerializer,
     RecipeCreateSerializer,
     RecipeReadSerializer,
-    RecipeShortSerializer,
+    ShoppingCartIngredientSerializer,
+    SubscribedUserSerializer,
     SubscriptionSerializer,
     TagSerializer,
     UserFavouriteSerializer,
-    UserSerializer,
     UserShoppingCartSerializer,
 )
-from core.constants import MAIN_URL
+from api.warmup import warmup
+from core.constants import (
+    INGREDIENT_SEARCH_LIMIT,
+    MAIN_URL,
+    MAX_INGREDIENT_SEARCH_LIMIT,
+    PAGE_SIZE_QUERY_PARAM,
+    SHOPPING_CART_CHUNK_SIZE,
+    SHOPPING_CART_FORMAT_QUERY_PARAM,
+)
+from core.versions import get_versions
+from recipes import bulk, shopping_cart, short_links
+from recipes.ingredient_index import ingredient_index
 from recipes.models import (
     Ingredient,
     Recipe,
-    RecipeIngredient,
     Tag,
+    UserFavourite,
+    UserShoppingCart,
 )
+from recipes.tag_slugs import tag_slugs
+from users.models import Subscription
 
 logger = logging.getLogger('views')
 User = get_user_model()
 
 
+def bulk_change(request, add, remove, *args):
+    """POST добавляет, DELETE убирает; в ответе итог по каждому id."""
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    change = add if request.method == 'POST' else remove
+    return Response(change(
+        *args, request.user.pk, serializer.validated_data['ids']
+    ))
+
+
 class AvatarUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -61,7 +95,7 @@ class AvatarUpdateView(APIView):
             serializer.save()
             return Response({'avatar': f"{settings.MEDIA_URL}{user.avatar}"},
                             status=200)
-        logger.warning(f'Проблема с валидацией {serializer.errors}')
+        logger.warning('Проблема с валидацией %s', serializer.errors)
         return Response(serializer.errors, status=400)
 
     def delete(self, request, *args, **kwargs):
@@ -69,20 +103,21 @@ class AvatarUpdateView(APIView):
 
         # Удаляем аватар пользователя
         if user.avatar:
-            # Удаляем файл аватара с диска, если он существует
-            if os.path.isfile(user.avatar.path):
-                os.remove(user.avatar.path)
+            avatar = user.avatar.name
             user.avatar = None
             user.save()
-            logger.info(f'Аватар пользователя {user.username} удалён')
+            # Файл удалится с диска, если на него больше никто не ссылается
+            user.avatar.storage.delete(avatar)
+            logger.info('Аватар пользователя %s удалён', user.username)
             return Response({'message': 'Аватар успешно удалён'}, status=200)
         else:
             logger.warning(
-                f'У пользователя {user.username} нет аватара для удаления')
+                'У пользователя %s нет аватара для удаления', user.username)
             return Response({'error': 'Аватар отсутствует'}, status=404)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
@@ -90,19 +125,103 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (IngredientSearchFilter,)
     search_fields = ('^name',)
 
+    def get_version_keys(self):
+        if self.action == 'retrieve':
+            return (f'ingredient:{self.get_lookup_pk()}',)
+        return ('ingredients',)
+
+    def object_exists(self, pk):
+        return ingredient_index.get(pk) is not None
+
+    # Чтение идёт из индекса в памяти процесса, без запросов к базе
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.list_from_index, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.retrieve_from_index, request, *args, **kwargs
+        )
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    def list_from_index(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return Response(ingredient_index.all())
+        try:
+            limit = min(
+                int(request.query_params.get(
+                    PAGE_SIZE_QUERY_PARAM, INGREDIENT_SEARCH_LIMIT
+                )),
+                MAX_INGREDIENT_SEARCH_LIMIT
+            )
+        except ValueError:
+            limit = INGREDIENT_SEARCH_LIMIT
+        return Response(ingredient_index.search(name, max(limit, 0)))
+
+    def retrieve_from_index(self, request, *args, **kwargs):
+        try:
+            ingredient = ingredient_index.get(int(kwargs['pk']))
+        except ValueError:
+            ingredient = None
+        if ingredient is None:
+            raise Http404('Ингредиент не найден')
+        return Response(ingredient)
+
+
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = [AllowAny]
 
+    def get_version_keys(self):
+        if self.action == 'retrieve':
+            return (f'tag:{self.get_lookup_pk()}',)
+        return ('tags',)
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().order_by('-id')
-    pagination_class = CustomPagination
+    def object_exists(self, pk):
+        return tag_slugs.has_id(pk)
+
+
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Recipe.objects.defer('search_vector').order_by('-id')
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    etag_vary_on_user = True
+
+    def get_version_keys(self):
+        keys = ['tags', 'ingredients']
+        if self.action == 'retrieve':
+            keys.append(f'recipe:{self.get_lookup_pk()}')
+        else:
+            keys.append('recipes')
+        if self.request.user.is_authenticated:
+            keys.append(f'user:{self.request.user.pk}')
+        return keys
+
+    def get_queryset(self):
+        # Для чтения аннотируем флаги текущего пользователя; связанные
+        # объекты RecipeReadSerializer догружает сам для промахов кеша
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        queryset = queryset.select_related('author')
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(UserFavourite.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(UserShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                author_is_subscribed=Exists(Subscription.objects.filter(
+                    subscriber=user, subscribed_to=OuterRef('author')
+                )),
+            )
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -112,6 +231,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ('update', 'partial_update', 'destroy'):
             return [IsAuthenticated(), IsAuthor()]
+        # Права, заданные в @action, берутся из permission_classes
+        handler = getattr(self, self.action or '', None)
+        if 'permission_classes' in getattr(handler, 'kwargs', {}):
+            return super().get_permissions()
         return [AllowAny()]
 
     def perform_create(self, serializer):
@@ -125,10 +248,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response({'short-link': short_link})
 
     def generate_short_link(self, recipe):
-        short_link = base64.urlsafe_b64encode(str(recipe.id).encode()).decode()
-        return f'https://{MAIN_URL}/s/{short_link}'
+        return f'https://{MAIN_URL}/s/{short_links.get_code(recipe)}'
 
     @staticmethod
+    @transaction.atomic
     def toggle_favorite_or_cart(request, recipe, serializer_class,
                                 related_name):
         user = request.user
@@ -159,6 +282,21 @@ class RecipeViewSet(viewsets.ModelViewSet):
             request, recipe, UserShoppingCartSerializer, 'user_shopping_cart'
         )
 
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='favorite/bulk', permission_classes=[IsAuthenticated])
+    def favorite_bulk(self, request):
+        return bulk_change(
+            request, bulk.add_recipes, bulk.remove_recipes, UserFavourite
+        )
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='shopping_cart/bulk',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_bulk(self, request):
+        return bulk_change(
+            request, bulk.add_recipes, bulk.remove_recipes, UserShoppingCart
+        )
+
     @action(
         detail=False,
         methods=['get'],
@@ -166,37 +304,129 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def download_shopping_cart(self, request):
         user = request.user
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__user_shopping_cart__user=user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
-        ).order_by('ingredient__name')
-
-        if not ingredients:
+        file_format = request.query_params.get(
+            SHOPPING_CART_FORMAT_QUERY_PARAM, 'csv'
+        )
+        if file_format not in SHOPPING_CART_EXPORTS:
+            return Response(
+                {'detail': 'Формат должен быть одним из: '
+                           f'{", ".join(SHOPPING_CART_EXPORTS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Версия итогов корзины меняется при каждом их пересчёте, поэтому
+        # проверка идёт до обращения к базе
+        etag = self.get_shopping_cart_etag(user, file_format)
+        if etag_matches(request, etag):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+        totals = user.shopping_cart_ingredients.all()
+        # Итогов нет и у корзин, собранных до появления таблицы итогов
+        if not totals.exists() and not shopping_cart.restore_totals(user.pk):
             return Response(
                 {'detail': 'Список покупок пуст'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        ingredients = totals.values(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            total_amount=F('amount')
+        ).order_by('ingredient__name').iterator(
+            chunk_size=SHOPPING_CART_CHUNK_SIZE
+        )
+        export, content_type = SHOPPING_CART_EXPORTS[file_format]
+        response = StreamingHttpResponse(
+            export(ingredients), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{file_format}"'
+        )
+        response['ETag'] = etag
+        return response
 
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response[
-            'Content-Disposition'] = 'attachment; filename="shopping_cart.csv"'
-        writer = csv.writer(response, lineterminator='\n')
-        writer.writerow(['Ингредиент', 'Единица измерения', 'Количество'])
-        for item in ingredients:
-            writer.writerow([
-                item['ingredient__name'],
-                item['ingredient__measurement_unit'],
-                item['total_amount']
-            ])
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_totals(self, request):
+        etag = self.get_shopping_cart_etag(request.user, 'totals')
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            if not request.user.shopping_cart_ingredients.exists():
+                shopping_cart.restore_totals(request.user.pk)
+            totals = request.user.shopping_cart_ingredients.select_related(
+                'ingredient'
+            ).order_by('ingredient__name')
+            response = Response(
+                ShoppingCartIngredientSerializer(totals, many=True).data
+            )
+        response['ETag'] = etag
         return response
 
+    @staticmethod
+    def get_shopping_cart_etag(user, variant):
+        key = f'cart:{user.pk}'
+        return make_etag((variant, key, get_versions((key,))[key]))
+
 
 class UserViewSet(UserViewSet):
     pagination_class = CustomPagination
 
+    def get_queryset(self):
+        # Флаг подписки для всех пользователей страницы — подзапросом
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_subscribed=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(is_subscribed=Exists(
+            Subscription.objects.filter(
+                subscriber=user, subscribed_to=OuterRef('pk')
+            )
+        ))
+
+    @staticmethod
+    def get_recipes_limit(request):
+        recipes_limit = request.query_params.get('recipes_limit')
+        if not recipes_limit:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+            if recipes_limit < 0:
+                raise ValueError
+        except ValueError:
+            raise ParseError(
+                'recipes_limit должен быть неотрицательным числом'
+            )
+        return recipes_limit
+
+    def get_subscribed_authors(self, queryset, recipes_limit):
+        """Авторы с количеством и последними рецептами.
+
+        Число запросов не зависит от количества авторов: последние
+        recipes_limit рецептов каждого автора выбираются одним запросом
+        с коррелированным подзапросом по автору.
+        """
+        recipes = Recipe.objects.order_by('-id')
+        if recipes_limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-id').values('id')[:recipes_limit]
+            ))
+        return queryset.annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='latest_recipes')
+        )
+
     @action(detail=True, methods=['post', 'delete'],
             permission_classes=[IsAuthenticated])
     def subscribe(self, request, id=None):
@@ -204,35 +434,30 @@ class UserViewSet(UserViewSet):
         user = get_object_or_404(User, id=id)
         if request.method == 'POST':
             logger.info('POST запрос (подписаться)')
+            recipes_limit = self.get_recipes_limit(request)
             serializer = SubscriptionSerializer(
                 data={'subscribed_to': user.id},
                 context={'request': request}
             )
             serializer.is_valid(raise_exception=True)
             serializer.save(subscriber=request.user)
-            data = UserSerializer(user, context={'request': request}).data
-            data['recipes_count'] = user.recipes.count()
-            recipes_limit = request.query_params.get('recipes_limit')
-            recipes = user.recipes.all()
-            if recipes_limit:
-                try:
-                    recipes_limit = int(recipes_limit)
-                    if recipes_limit < 0:
-                        raise ValueError
-                    recipes = recipes[:recipes_limit]
-                except ValueError:
-                    return Response(
-                        {
-                            'detail':
-                                'recipes_limit должен быть '
-                                'неотрицательным числом'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            data['recipes'] = RecipeShortSerializer(recipes, many=True).data
+            author = self.get_subscribed_authors(
+                User.objects.filter(pk=user.pk), recipes_limit
+            ).get()
+            data = SubscribedUserSerializer(
+                author, context={'request': request}
+            ).data
             return Response(data, status=status.HTTP_201_CREATED)
         user.subscribers.filter(subscriber=request.user).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='subscribe/bulk', permission_classes=[IsAuthenticated])
+    def subscribe_bulk(self, request):
+        return bulk_change(
+            request, bulk.subscribe, bulk.unsubscribe
+        )
+
     @action(
         detail=False,
         methods=['get'],
@@ -240,58 +465,47 @@ class UserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         logger.info('начало обработки подписки')
-        queryset = request.user.subscriptions.all().annotate(
-            recipes_count=Count('subscribed_to__recipes')
-        ).order_by('id')
-        logger.info(f'Подписки: {list(queryset.values("subscribed_to__id"))}')
+        queryset = self.get_subscribed_authors(
+            User.objects.filter(
+                subscribers__subscriber=request.user
+            ).order_by('subscribers__id'),
+            self.get_recipes_limit(request)
+        )
         page = self.paginate_queryset(queryset)
-        logger.info(f'Страница: {page}')
-        if page is not None:
-            users = [subscription.subscribed_to for subscription in page]
-        else:
-            users = [subscription.subscribed_to for subscription in queryset]
-        serializer = UserSerializer(users, many=True,
-                                    context={'request': request})
-        logger.info(f'Сериализованные данные: {serializer.data}')
-        data = []
-        recipes_limit = request.query_params.get('recipes_limit')
-        logger.info(f'Лимит {recipes_limit}')
-        for user_data in serializer.data:
-            user = User.objects.get(id=user_data['id'])
-            recipes = user.recipes.all()
-            logger.info(f'Все рецепты пользователя {recipes}')
-            if recipes_limit:
-                try:
-                    recipes_limit = int(recipes_limit)
-                    if recipes_limit < 0:
-                        raise ValueError
-                    recipes = recipes[:recipes_limit]
-                except ValueError:
-                    return Response(
-                        {
-                            'detail':
-                                'recipes_limit должен быть '
-                                'неотрицательным числом'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            user_data['recipes'] = RecipeShortSerializer(recipes,
-                                                         many=True).data
-            logger.info(f'рецепт {user_data["recipes"]}')
-            user_data['recipes_count'] = user.recipes.count()
-            logger.info(f'количество {user_data["recipes_count"]}')
-            data.append(user_data)
-            logger.info(f'данные {data}')
-        return self.get_paginated_response(data)
+        serializer = SubscribedUserSerializer(
+            queryset if page is None else page,
+            many=True,
+            context={'request': request}
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
 
 
 class ShortLinkRedirectView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request, short_code, *args, **kwargs):
-        try:
-            recipe_id = base64.urlsafe_b64decode(short_code.encode()).decode()
-            recipe_id = int(recipe_id)
-        except (ValueError, UnicodeDecodeError):
+        recipe_id = short_links.resolve(short_code)
+        if recipe_id is None:
             raise Http404('Ссылка не найдена')
-
+        short_links.hit_buffer.add(recipe_id)
         return redirect(f'/recipes/{recipe_id}/')
+
+
+class ReadinessView(APIView):
+    """Готовность воркера принимать трафик: 503, пока идёт прогрев."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        if not warmup.ready.is_set():
+            warmup.start()
+            return Response(
+                {'status': warmup.status(), 'failed': warmup.failed},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response({
+            'status': warmup.status(),
+            'warmup_ms': round(warmup.duration * 1000, 1),
+        })
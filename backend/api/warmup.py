@@ -0,0 +1,159 @@
+"""Прогрев воркера перед приёмом запросов.
+
+Соединения с базой и кешем, резолвер URL, поля сериализаторов и
+справочники в памяти создаются лениво, то есть за счёт первых
+пользователей воркера. Гуникорн вызывает warmup.run() в хуке
+post_worker_init (gunicorn.conf.py), а /api/health/ready/ отвечает
+готовностью только после его завершения.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.urls import resolve, reverse
+
+logger = logging.getLogger('warmup')
+
+# Маршруты, которые разрешаются при прогреве: вместе с ними строятся
+# и кешируются шаблоны всего резолвера
+WARMUP_URLS = ('api:recipes-list', 'api:ingredients-list', 'api:tags-list')
+
+
+def warm_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def warm_thread_connections():
+    """Открывает соединения в потоках пула асинхронных представлений."""
+    if not settings.ASYNC_VIEWS:
+        return
+    from api.async_views import executor
+
+    # Барьер не отпускает поток, пока остальные задачи не разобраны,
+    # поэтому каждая задача выполняется в отдельном потоке пула
+    size = settings.ASYNC_DB_POOL_SIZE
+    barrier = threading.Barrier(size)
+
+    def connect():
+        warm_connections()
+        barrier.wait(timeout=settings.WARMUP_TIMEOUT)
+
+    for future in [executor.submit(connect) for _ in range(size)]:
+        future.result()
+
+
+def warm_caches():
+    for alias in settings.CACHES:
+        caches[alias].get('warmup')
+
+
+def warm_urls():
+    for name in WARMUP_URLS:
+        resolve(reverse(name))
+
+
+def warm_serializers():
+    from api.filters import RecipeFilter
+    from api.serializers import (
+        IngredientSerializer,
+        RecipeCreateSerializer,
+        RecipeReadSerializer,
+        RecipeShortSerializer,
+        SubscribedUserSerializer,
+        TagSerializer,
+        UserSerializer,
+    )
+    from recipes.models import Recipe
+
+    for serializer_class in (
+        IngredientSerializer,
+        RecipeCreateSerializer,
+        RecipeReadSerializer,
+        RecipeShortSerializer,
+        SubscribedUserSerializer,
+        TagSerializer,
+        UserSerializer,
+    ):
+        # Поля ModelSerializer строятся по метаданным модели при обращении
+        serializer_class().fields
+    RecipeFilter(queryset=Recipe.objects.none()).form
+
+
+def warm_lookups():
+    from recipes.ingredient_index import ingredient_index
+    from recipes.tag_slugs import tag_slugs
+
+    ingredient_index.all()
+    tag_slugs.choices()
+
+
+class WarmUp:
+    steps = (
+        ('connections', warm_connections),
+        ('thread_connections', warm_thread_connections),
+        ('caches', warm_caches),
+        ('urls', warm_urls),
+        ('serializers', warm_serializers),
+        ('lookups', warm_lookups),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = False
+        self.ready = threading.Event()
+        self.failed = []
+        self.duration = None
+
+    def run(self):
+        """Выполняет все шаги прогрева; повторный вызов ничего не делает.
+
+        Ошибка шага не останавливает остальные, но воркер остаётся
+        неготовым: так балансировщик не пустит на него трафик, а
+        следующая проверка готовности повторит прогрев.
+        """
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.failed = []
+        start = time.perf_counter()
+        for name, step in self.steps:
+            step_start = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                logger.exception('Ошибка прогрева: %s', name)
+                self.failed.append(name)
+                continue
+            logger.debug(
+                'Прогрев %s: %.1f мс', name,
+                (time.perf_counter() - step_start) * 1000
+            )
+        self.duration = time.perf_counter() - start
+        if self.failed:
+            self._started = False
+            return
+        self.ready.set()
+        logger.info(
+            'Воркер прогрет за %.1f мс', self.duration * 1000,
+            extra={'warmup_ms': round(self.duration * 1000, 1)}
+        )
+
+    def start(self):
+        """Запускает прогрев в фоне, если его не было (например, runserver)."""
+        if not self._started:
+            threading.Thread(target=self.run, daemon=True).start()
+
+    def status(self):
+        if self.ready.is_set():
+            return 'ready'
+        if self.failed:
+            return 'failed'
+        return 'warming up'
+
+
+warmup = WarmUp()
@@ -14,8 +14,23 @@ MAX_LENGTH_TAG_CHAR = 32
 MIN_COOKING_TIME = 1
 MAX_LENGTH_RECIPE_NAME = 128
 
+IMAGE_VARIANT_THUMBNAIL = 'thumbnail'
+IMAGE_VARIANT_CARD = 'card'
+IMAGE_VARIANT_FULL = 'full'
+IMAGE_VARIANTS = {
+    IMAGE_VARIANT_THUMBNAIL: (200, 200),
+    IMAGE_VARIANT_CARD: (600, 600),
+    IMAGE_VARIANT_FULL: (1280, 1280),
+}
+IMAGE_VARIANT_QUALITY = 85
+
 MIN_AMOUNT = 1
 
+MAX_LENGTH_CATALOGUE_SOURCE = 64
+MAX_LENGTH_CHECKSUM = 64
+MAX_LENGTH_MEDIA_NAME = 255
+CATALOGUE_CHUNK_SIZE = 5000
+
 PATTERN_VALID_USERNAME = r'^[\w.@+-]+\Z'
 URL_PATH_ME = 'me'
 
@@ -24,3 +39,44 @@ MAIN_URL = os.getenv('MAIN_URL')
 DEFAULT_PAGE_SIZE = 10
 MAX_PAGE_SIZE = 100
 PAGE_SIZE_QUERY_PARAM = 'limit'
+
+PAGINATION_QUERY_PARAM = 'pagination'
+PAGINATION_CURSOR = 'cursor'
+CURSOR_QUERY_PARAM = 'cursor'
+COUNT_QUERY_PARAM = 'count'
+COUNT_EXACT = 'exact'
+COUNT_ESTIMATE = 'estimate'
+COUNT_NONE = 'none'
+
+INGREDIENT_SEARCH_LIMIT = 50
+MAX_INGREDIENT_SEARCH_LIMIT = 500
+INGREDIENT_INDEX_CHECK_INTERVAL = 5
+TAG_SLUGS_CHECK_INTERVAL = 5
+
+RECIPE_CACHE_ALIAS = 'recipes'
+RECIPE_CACHE_STATS_LOG_INTERVAL = 1000
+
+# Сколько id принимают массовые эндпоинты избранного, корзины и подписок
+BULK_MAX_IDS = 100
+
+SHOPPING_CART_FORMAT_QUERY_PARAM = 'file_format'
+SHOPPING_CART_CHUNK_SIZE = 2000
+
+# Длина base64-кода старых ссылок кратна 4, поэтому новые коды
+# длиной 6 символов с ними не пересекаются
+SHORT_LINK_CODE_LENGTH = 6
+SHORT_LINK_CODE_ATTEMPTS = 10
+SHORT_LINK_CACHE_SIZE = 10000
+SHORT_LINK_CACHE_TTL = 300
+SHORT_LINK_FLUSH_INTERVAL = 10
+
+# Запись в LRU процесса не сбрасывается из других процессов, поэтому
+# её срок жизни короткий; общий кеш сбрасывается сразу
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 30
+AUTH_TOKEN_SHARED_CACHE_TTL = 300
+AUTH_TOKEN_CACHE_STATS_LOG_INTERVAL = 1000
+
+SEARCH_CONFIG = 'russian'
+SEARCH_TRIGRAM_WEIGHT = 0.5
+SEARCH_VECTOR_CHUNK_SIZE = 1000
@@ -0,0 +1,102 @@
+"""Неблокирующая запись логов в формате JSON Lines.
+
+Обработчик кладёт записи в очередь, а файл пишет фоновый поток
+QueueListener, поэтому поток запроса не ждёт дискового ввода-вывода.
+"""
+import copy
+import json
+import logging
+import random
+from datetime import datetime, timezone
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    TimedRotatingFileHandler
+)
+from queue import Full, Queue
+
+# Атрибуты, которые есть у любой записи; остальные пришли через extra
+RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {
+    'message', 'asctime'
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON."""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc_info'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю rate записей уровня DEBUG."""
+
+    def __init__(self, rate=1.0, name=''):
+        super().__init__(name)
+        self.rate = float(rate)
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class QueuedFileHandler(QueueHandler):
+    """Передаёт записи в фоновый поток, который пишет их в файл.
+
+    Принимает те же параметры, что TimedRotatingFileHandler, и пишет
+    записи в формате JSON Lines.
+    """
+
+    def __init__(self, filename, queue_size=10000, **kwargs):
+        super().__init__(Queue(queue_size))
+        file_handler = TimedRotatingFileHandler(filename, **kwargs)
+        file_handler.setFormatter(JsonFormatter())
+        self.listener = QueueListener(self.queue, file_handler)
+        self.listener.start()
+        self.stopped = False
+
+    def prepare(self, record):
+        # Аргументы подставляются сразу: объекты могут измениться раньше,
+        # чем фоновый поток дойдёт до записи
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # При переполнении очереди запись теряется, а запрос не ждёт
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            pass
+
+    def close(self):
+        # logging.shutdown при выходе закрывает обработчик и дожидается
+        # записи всех сообщений из очереди
+        if not self.stopped:
+            self.stopped = True
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+        super().close()
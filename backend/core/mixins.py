@@ -0,0 +1,25 @@
+class DenormalizedFieldsMixin:
+    """Не записывает денормализованные поля при обычном save().
+
+    Счётчики меняются атомарными приращениями F(), а вектор поиска —
+    отдельным UPDATE. Полное сохранение записало бы значения, загруженные
+    вместе с объектом, и отменило бы параллельные изменения. При создании
+    объекта и при явном update_fields поля записываются как обычно.
+    """
+    denormalized_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not args
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.denormalized_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,161 @@
+"""Хранилище медиафайлов с адресацией по содержимому.
+
+Файл сохраняется под именем из SHA-256 его содержимого, поэтому
+одинаковые загрузки хранятся один раз, а ссылка на файл никогда не
+меняет содержимое и может кешироваться навсегда.
+
+Число ссылок на каждый файл хранится в таблице recipes.MediaFile:
+сохранение файла добавляет ссылку, delete() снимает одну, и файл
+удаляется с диска, когда ссылок не осталось. Для файлов без строки в
+таблице (загруженных до её появления) число ссылок неизвестно, такие
+файлы не удаляются. Команда rehash_media пересчитывает таблицу по
+всем полям из REFERENCE_LOOKUPS.
+"""
+import hashlib
+import os
+import tempfile
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+# Поля моделей, которые могут ссылаться на файлы хранилища; у поля
+# image_variants ссылки — значения словаря
+REFERENCE_LOOKUPS = (
+    ('users.User', 'avatar'),
+    ('recipes.Recipe', 'image'),
+    ('recipes.Recipe', 'image_variants'),
+)
+VARIANTS_SOURCE_KEY = 'source'
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    directory = os.path.dirname(name)
+    ext = os.path.splitext(name)[1].lower()
+    return os.path.join(directory, digest[:2], f'{digest}{ext}')
+
+
+def media_files():
+    return apps.get_model('recipes', 'MediaFile').objects
+
+
+def add_reference(name, count=1):
+    files = media_files()
+    files.bulk_create(
+        [files.model(name=name, references=0)], ignore_conflicts=True
+    )
+    files.filter(name=name).update(references=F('references') + count)
+
+
+def collect_references():
+    """Число ссылок на каждый файл по данным всех полей-ссылок."""
+    references = Counter()
+    for model, field in REFERENCE_LOOKUPS:
+        values = apps.get_model(model).objects.values_list(
+            field, flat=True
+        ).iterator()
+        for value in values:
+            if isinstance(value, dict):
+                references.update(
+                    name for key, name in value.items()
+                    if key != VARIANTS_SOURCE_KEY and name
+                )
+            elif value:
+                references[value] += 1
+    return references
+
+
+@transaction.atomic
+def rebuild_references():
+    """Заполняет таблицу ссылок заново, возвращает число ссылок по файлам."""
+    references = collect_references()
+    files = media_files()
+    files.all().delete()
+    files.bulk_create(
+        (
+            files.model(name=name, references=count)
+            for name, count in references.items()
+        ),
+        batch_size=1000
+    )
+    return references
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменяется хешем в _save
+        return name
+
+    def _save(self, name, content):
+        name = hashed_name(name, content_hash(content))
+        if not self.exists(name):
+            self._write(name, content)
+        add_reference(name)
+        return name
+
+    def _write(self, name, content):
+        """Пишет файл во временный и атомарно переименовывает.
+
+        Одинаковые файлы, сохраняемые параллельно, просто заменяют друг
+        друга, а недописанный файл никогда не виден под итоговым именем.
+        """
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0)
+            try:
+                os.makedirs(
+                    directory, self.directory_permissions_mode, exist_ok=True
+                )
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @transaction.atomic
+    def delete(self, name):
+        """Снимает ссылку на файл и удаляет его, если ссылок не осталось."""
+        if not name:
+            return
+        row = media_files().select_for_update().filter(name=name).first()
+        if row is None:
+            return
+        if row.references > 1:
+            media_files().filter(pk=row.pk).update(
+                references=F('references') - 1
+            )
+            return
+        row.delete()
+        transaction.on_commit(lambda: self.delete_unreferenced(name))
+
+    def delete_unreferenced(self, name):
+        # Пока шла транзакция, тот же файл мог быть загружен заново
+        if not media_files().filter(name=name).exists():
+            super().delete(name)
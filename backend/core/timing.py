@@ -0,0 +1,139 @@
+"""Замер времени обработки запроса и работы с базой.
+
+Для выбранных запросов middleware считает SQL-запросы и время базы
+через connection.execute_wrapper, рендерер — время сериализации ответа.
+Итог отдаётся в заголовке Server-Timing и одной записью лога, замеры
+передаются в её дополнительных полях.
+"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger('timing')
+
+
+class RequestTiming:
+    def __init__(self):
+        # Под ASGI запросы учитываются только в представлениях из
+        # api.async_views, для остальных метрика базы не отдаётся
+        self.tracked = False
+        self.queries = 0
+        self.db_time = 0
+        self.render_time = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def header(self, total_time):
+        metrics = []
+        if self.tracked:
+            metrics.append(
+                f'db;dur={self.db_time * 1000:.1f};'
+                f'desc="{self.queries} queries"'
+            )
+        metrics.append(f'serialize;dur={self.render_time * 1000:.1f}')
+        metrics.append(f'total;dur={total_time * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def track_queries(timing):
+    """Учитывает в timing запросы к базе из текущего потока."""
+    with ExitStack() as stack:
+        if timing is not None:
+            timing.tracked = True
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing))
+        yield
+
+
+class ServerTimingMiddleware:
+    """Работает и под WSGI, и под ASGI.
+
+    Соединения с базой у каждого потока свои, поэтому под ASGI запросы
+    учитываются в потоке, где выполняется представление (api.async_views).
+    Синхронные представления Django выполняет в общем потоке вперемешку
+    с другими запросами, их запросы к базе не учитываются.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = asyncio.iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        request.timing = timing = RequestTiming()
+        start = time.perf_counter()
+        with track_queries(timing):
+            response = self.get_response(request)
+        return self.finish(request, response, timing, start)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        request.timing = timing = RequestTiming()
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        return self.finish(request, response, timing, start)
+
+    @staticmethod
+    def sampled():
+        return settings.SERVER_TIMING and (
+            random.random() < settings.SERVER_TIMING_SAMPLE_RATE
+        )
+
+    @staticmethod
+    def finish(request, response, timing, start):
+        total_time = time.perf_counter() - start
+        # Запросы потокового ответа выполняются уже после middleware
+        if not response.streaming:
+            response['Server-Timing'] = timing.header(total_time)
+        logger.info(
+            '%s %s', request.method, request.path,
+            extra={
+                'status': response.status_code,
+                'queries': timing.queries if timing.tracked else None,
+                'db_ms': (
+                    round(timing.db_time * 1000, 1) if timing.tracked
+                    else None
+                ),
+                'serialize_ms': round(timing.render_time * 1000, 1),
+                'total_ms': round(total_time * 1000, 1),
+                'streaming': response.streaming,
+            }
+        )
+        return response
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer, который учитывает время рендеринга в RequestTiming."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        request = (renderer_context or {}).get('request')
+        timing = getattr(request, 'timing', None)
+        if timing is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            timing.render_time += time.perf_counter() - start
@@ -0,0 +1,37 @@
+"""Счётчики версий ресурсов и коллекций.
+
+Версия хранится в общем кеше и меняется при каждом изменении данных.
+По версиям строятся ETag ответов и ключи кешей, поэтому смена версии
+сразу делает устаревшими все производные от неё данные.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY_PREFIX = 'version:'
+
+
+def new_version():
+    return str(time.time_ns())
+
+
+def get_versions(keys):
+    """Возвращает словарь {ключ: версия}, создавая недостающие версии."""
+    cache_keys = {f'{VERSION_KEY_PREFIX}{key}': key for key in keys}
+    found = cache.get_many(cache_keys)
+    missing = {
+        cache_key: new_version()
+        for cache_key in cache_keys if cache_key not in found
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {key: found[cache_key] for cache_key, key in cache_keys.items()}
+
+
+def bump_versions(keys):
+    version = new_version()
+    cache.set_many(
+        {f'{VERSION_KEY_PREFIX}{key}': version for key in keys},
+        timeout=None
+    )
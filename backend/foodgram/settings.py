@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework.authtoken',
     'rest_framework',
     'django_filters',
@@ -32,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -70,10 +72,35 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Соединение переиспользуется между запросами, в том числе
+        # открытое при прогреве воркера (api/warmup.py)
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# Версии данных (core.versions) должны быть видны всем процессам,
+# включая management-команды, поэтому кеш по умолчанию общий (memcached).
+# Тесты его не требуют: tests/conftest.py подменяет CACHES на кеши в
+# памяти процесса, поэтому в CI сервиса memcached нет
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.memcached.PyMemcacheCache'
+)
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', 'memcached:11211')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    },
+    'recipes': {
+        'BACKEND': os.getenv('RECIPE_CACHE_BACKEND', CACHE_BACKEND),
+        'LOCATION': os.getenv('RECIPE_CACHE_LOCATION', CACHE_LOCATION),
+        'KEY_PREFIX': 'recipes',
+        'TIMEOUT': int(os.getenv('RECIPE_CACHE_TIMEOUT', 60 * 60)),
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -116,13 +143,36 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.timing.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Под ASGI (foodgram/asgi.py) горячие эндпоинты чтения работают как
+# асинхронные представления, запросы к базе идут в пуле из
+# ASYNC_DB_POOL_SIZE потоков
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', 10))
+
+# Псевдоним общего кеша для пользователей по токенам, например default
+# с бэкендом memcached; пусто — только LRU процесса
+AUTH_TOKEN_CACHE = os.getenv('AUTH_TOKEN_CACHE', '')
+
+# Сколько секунд ждать открытия соединений в потоках пула при прогреве
+WARMUP_TIMEOUT = int(os.getenv('WARMUP_TIMEOUT', 30))
+
+# Заголовок Server-Timing и строка лога с числом SQL-запросов и временем
+# обработки; замеряется доля запросов SERVER_TIMING_SAMPLE_RATE
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'True') == 'True'
+SERVER_TIMING_SAMPLE_RATE = float(os.getenv('SERVER_TIMING_SAMPLE_RATE', 1))
+
 CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOWED_ORIGINS = [
@@ -130,40 +180,51 @@ CORS_ALLOWED_ORIGINS = [
     'http://127.0.0.1',
 ]
 
+# В продакшене по умолчанию INFO: отладочные сообщения не формируются
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 1))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
-        },
-        'simple': {
-            'format': '{levelname} {message}',
-            'style': '{',
+    'filters': {
+        'debug_sampling': {
+            '()': 'core.logs.SamplingFilter',
+            'rate': LOG_DEBUG_SAMPLE_RATE,
         },
     },
     'handlers': {
         'file': {
             'level': 'DEBUG',
-            'class': 'logging.handlers.TimedRotatingFileHandler',
+            # Файл пишет фоновый поток, строки в формате JSON Lines
+            'class': 'core.logs.QueuedFileHandler',
             'filename': os.path.join(BASE_DIR, 'logs.log'),
+            'filters': ['debug_sampling'],
 
             'when': 'midnight',
             'backupCount': 30,
-            'formatter': 'verbose',
 
         },
     },
     'loggers': {
         'views': {
             'handlers': ['file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': True,
         },
         'backends': {
             'handlers': ['file'],
-            'level': 'DEBUG',
+            'level': LOG_LEVEL,
+            'propagate': True,
+        },
+        'timing': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
+        'warmup': {
+            'handlers': ['file'],
+            'level': LOG_LEVEL,
             'propagate': True,
         },
     },
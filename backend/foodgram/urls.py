@@ -1,13 +1,13 @@
 from django.contrib import admin
 from django.urls import include, path
 
-from api.views import ShortLinkRedirectView
+from api.urls import short_link_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('s/<str:short_code>/',
-         ShortLinkRedirectView.as_view(),
+         short_link_view,
          name='short-link-redirect'),
 
 ]
@@ -0,0 +1,19 @@
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+# SERVER_MODE=asgi запускает foodgram.asgi в воркерах uvicorn: горячие
+# эндпоинты чтения становятся асинхронными, см. api/async_views.py
+if os.getenv('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+
+
+def post_worker_init(worker):
+    """Прогревает воркер до первого запроса, см. api/warmup.py."""
+    from api.warmup import warmup
+
+    warmup.run()
@@ -1,9 +1,11 @@
 from django.contrib import admin
 
+from recipes import shopping_cart
 from recipes.models import (
     Ingredient,
     Recipe,
     RecipeIngredient,
+    ShortLink,
     Tag,
     UserFavourite,
     UserShoppingCart
@@ -30,16 +32,25 @@ class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
         'author',
+        'favourite_count',
+        'cart_count',
     )
     search_fields = ('name', 'author__username')
     list_filter = ('tags',)
     inlines = [RecipeIngredientInline]
-    readonly_fields = ('favourite_count',)
+    readonly_fields = ('favourite_count', 'cart_count')
 
-    @admin.display(description='Добавлений в избранное')
-    def favourite_count(self, obj):
-        # Подсчитываем количество добавлений в избранное для рецепта
-        return obj.user_favourite.count()
+    def save_related(self, request, form, formsets, change):
+        old_amounts = {}
+        if change:
+            old_amounts = dict(form.instance.recipe_ingredients.values_list(
+                'ingredient_id', 'amount'
+            ))
+        super().save_related(request, form, formsets, change)
+        if change:
+            shopping_cart.recipe_ingredients_changed(
+                form.instance.pk, old_amounts
+            )
 
 
 @admin.register(Tag)
@@ -56,6 +67,7 @@ class UserFavouriteAdmin(admin.ModelAdmin):
         'user',
         'recipe',
     )
+    ordering = ('user__username',)
 
 
 @admin.register(UserShoppingCart)
@@ -64,3 +76,19 @@ class UserShoppingCartAdmin(admin.ModelAdmin):
         'user',
         'recipe',
     )
+    ordering = ('user__username',)
+
+
+@admin.register(ShortLink)
+class ShortLinkAdmin(admin.ModelAdmin):
+    list_display = (
+        'code',
+        'recipe',
+        'hits',
+    )
+    search_fields = ('code', 'recipe__name')
+    readonly_fields = ('recipe', 'code', 'hits')
+
+    def has_add_permission(self, request):
+        # Ссылки создаются при запросе get-link
+        return False
@@ -1,7 +1,27 @@
 from django.apps import AppConfig
+from django.db.models import CharField
+from django.db.models.signals import pre_migrate
+
+
+def create_extensions(using, **kwargs):
+    """Триграммному индексу по названию рецепта нужен pg_trgm."""
+    from django.db import connections
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        import recipes.signals  # noqa: F401
+        from recipes.search import TrigramWordSimilar
+
+        CharField.register_lookup(TrigramWordSimilar)
+        pre_migrate.connect(create_extensions, sender=self)
@@ -0,0 +1,190 @@
+"""Массовое добавление и удаление избранного, корзины и подписок.
+
+Все id проверяются одним запросом с IN, строки вставляются одним
+INSERT и удаляются одним DELETE. Ни то ни другое не вызывает сигналов,
+поэтому счётчики, итоги корзины и версии обновляются здесь явно — так
+же, как обработчики recipes.signals делают это для одной строки.
+Обновляются они только по строкам, которые вернул RETURNING: строку,
+вставленную или удалённую параллельным запросом, учитывает он сам.
+Ради RETURNING здесь и только здесь используется SQL вместо ORM:
+bulk_create(ignore_conflicts=True) и QuerySet.delete() не сообщают,
+какие строки изменились на самом деле.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef
+
+from core.versions import bump_versions
+from recipes import shopping_cart
+from recipes.counters import RECIPE_COUNTERS, change_counter
+from recipes.models import Recipe, UserShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+CREATED = 'created'
+DELETED = 'deleted'
+EXISTS = 'exists'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+SELF = 'self'
+
+
+def link_columns(model, owner_field, target_field):
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    meta = model._meta
+    return connection, quote(meta.db_table), (
+        quote(meta.get_field(owner_field).column),
+        quote(meta.get_field(target_field).column),
+    )
+
+
+def insert_rows(model, owner_field, owner_id, target_field, target_ids):
+    """Вставляет связи owner_id с target_ids, пропуская существующие.
+
+    INSERT ... ON CONFLICT DO NOTHING RETURNING нужен только для того,
+    чтобы узнать, какие строки вставлены; возвращает их id.
+    """
+    if not target_ids:
+        return []
+    connection, table, (owner, target) = link_columns(
+        model, owner_field, target_field
+    )
+    values = ', '.join(['(%s, %s)'] * len(target_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({owner}, {target}) VALUES {values} '
+            f'ON CONFLICT DO NOTHING RETURNING {target}',
+            [value for pk in target_ids for value in (owner_id, pk)]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_rows(model, owner_field, owner_id, target_field, target_ids):
+    """Удаляет связи owner_id с target_ids одним DELETE.
+
+    QuerySet.delete() при подключённых обработчиках сигналов загружает
+    строки и отправляет сигналы для каждой (удаляет он их пачками по pk),
+    а удалённые строки не возвращает. DELETE ... RETURNING нужен только
+    для того, чтобы узнать, какие строки удалены; возвращает их id.
+    """
+    if not target_ids:
+        return []
+    connection, table, (owner, target) = link_columns(
+        model, owner_field, target_field
+    )
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {owner} = %s '
+            f'AND {target} IN ({placeholders}) RETURNING {target}',
+            [owner_id, *target_ids]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def check_ids(queryset, ids, related):
+    """Существующие id и признак связи с пользователем — одним запросом."""
+    return dict(queryset.filter(pk__in=ids).annotate(
+        related=Exists(related)
+    ).values_list('pk', 'related'))
+
+
+def statuses(ids, found, changed, changed_status, unchanged_status):
+    return [
+        {'id': pk, 'status': (
+            NOT_FOUND if pk not in found
+            else changed_status if pk in changed
+            else unchanged_status
+        )}
+        for pk in ids
+    ]
+
+
+def bump_recipe_versions(user_id, recipe_ids):
+    keys = ['recipes', f'user:{user_id}']
+    keys += [f'recipe:{pk}' for pk in recipe_ids]
+    transaction.on_commit(lambda: bump_versions(keys))
+
+
+def bump_subscription_versions(subscriber_id):
+    keys = [f'user:{subscriber_id}']
+    transaction.on_commit(lambda: bump_versions(keys))
+
+
+@transaction.atomic
+def add_recipes(model, user_id, recipe_ids):
+    """Добавляет рецепты в избранное или корзину (model) пользователя."""
+    found = check_ids(Recipe.objects, recipe_ids, model.objects.filter(
+        user_id=user_id, recipe=OuterRef('pk')
+    ))
+    created = insert_rows(model, 'user', user_id, 'recipe', [
+        pk for pk in recipe_ids if pk in found and not found[pk]
+    ])
+    if created:
+        change_counter(Recipe, RECIPE_COUNTERS[model], created, 1)
+        if model is UserShoppingCart:
+            shopping_cart.add_recipes(user_id, created)
+        bump_recipe_versions(user_id, created)
+    return statuses(recipe_ids, found, set(created), CREATED, EXISTS)
+
+
+@transaction.atomic
+def remove_recipes(model, user_id, recipe_ids):
+    """Убирает рецепты из избранного или корзины (model) пользователя."""
+    found = check_ids(Recipe.objects, recipe_ids, model.objects.filter(
+        user_id=user_id, recipe=OuterRef('pk')
+    ))
+    deleted = delete_rows(model, 'user', user_id, 'recipe', [
+        pk for pk in recipe_ids if found.get(pk)
+    ])
+    if deleted:
+        change_counter(Recipe, RECIPE_COUNTERS[model], deleted, -1)
+        if model is UserShoppingCart:
+            shopping_cart.remove_recipes(user_id, deleted)
+        bump_recipe_versions(user_id, deleted)
+    return statuses(recipe_ids, found, set(deleted), DELETED, MISSING)
+
+
+@transaction.atomic
+def subscribe(subscriber_id, author_ids):
+    found = check_ids(User.objects, author_ids, Subscription.objects.filter(
+        subscriber_id=subscriber_id, subscribed_to=OuterRef('pk')
+    ))
+    created = insert_rows(
+        Subscription, 'subscriber', subscriber_id, 'subscribed_to', [
+            pk for pk in author_ids
+            if pk in found and not found[pk] and pk != subscriber_id
+        ]
+    )
+    if created:
+        change_counter(User, 'subscriber_count', created, 1)
+        change_counter(
+            User, 'subscription_count', (subscriber_id,), len(created)
+        )
+        bump_subscription_versions(subscriber_id)
+    result = statuses(author_ids, found, set(created), CREATED, EXISTS)
+    for item in result:
+        if item['id'] == subscriber_id:
+            item['status'] = SELF
+    return result
+
+
+@transaction.atomic
+def unsubscribe(subscriber_id, author_ids):
+    found = check_ids(User.objects, author_ids, Subscription.objects.filter(
+        subscriber_id=subscriber_id, subscribed_to=OuterRef('pk')
+    ))
+    deleted = delete_rows(
+        Subscription, 'subscriber', subscriber_id, 'subscribed_to', [
+            pk for pk in author_ids if found.get(pk)
+        ]
+    )
+    if deleted:
+        change_counter(User, 'subscriber_count', deleted, -1)
+        change_counter(
+            User, 'subscription_count', (subscriber_id,), -len(deleted)
+        )
+        bump_subscription_versions(subscriber_id)
+    return statuses(author_ids, found, set(deleted), DELETED, MISSING)
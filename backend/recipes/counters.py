@@ -0,0 +1,66 @@
+"""Денормализованные счётчики рецептов и пользователей.
+
+Счётчики меняются атомарными приращениями F() в обработчиках сигналов
+(recipes.signals) и сверяются командой reconcile_counters.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Recipe, UserFavourite, UserShoppingCart
+from users.models import Subscription
+
+User = get_user_model()
+
+# (модель со счётчиком, поле счётчика, модель связей, поле внешнего ключа)
+COUNTERS = (
+    (Recipe, 'favourite_count', UserFavourite, 'recipe'),
+    (Recipe, 'cart_count', UserShoppingCart, 'recipe'),
+    (User, 'recipe_count', Recipe, 'author'),
+    (User, 'subscriber_count', Subscription, 'subscribed_to'),
+    (User, 'subscription_count', Subscription, 'subscriber'),
+)
+
+# Счётчик рецепта, который меняет связь пользователя с ним
+RECIPE_COUNTERS = {
+    UserFavourite: 'favourite_count',
+    UserShoppingCart: 'cart_count',
+}
+
+
+def change_counter(model, field, pks, delta):
+    # Greatest не даёт счётчику уйти в минус, если он уже разошёлся
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def actual_count(related_model, fk_field):
+    """Подзапрос с реальным количеством связанных строк."""
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{fk_field: OuterRef('pk')}
+            ).order_by().values(fk_field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def reconcile(model, field, related_model, fk_field, pks):
+    """Исправляет расхождения счётчика у объектов с указанными pk.
+
+    Возвращает количество исправленных объектов.
+    """
+    drifted = []
+    rows = model.objects.filter(pk__in=pks).annotate(
+        actual=actual_count(related_model, fk_field)
+    ).exclude(**{field: F('actual')}).values_list('pk', 'actual')
+    for pk, actual in rows:
+        obj = model(pk=pk)
+        setattr(obj, field, actual)
+        drifted.append(obj)
+    model.objects.bulk_update(drifted, (field,))
+    return len(drifted)
@@ -0,0 +1,82 @@
+"""Уменьшенные копии изображений рецептов.
+
+Копии сохраняются рядом с оригиналом, их имена записываются в
+Recipe.image_variants вместе с именем оригинала (ключ source), по
+которому видно, что копии устарели.
+"""
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from core.constants import IMAGE_VARIANT_QUALITY, IMAGE_VARIANTS
+
+SOURCE_KEY = 'source'
+
+
+def variants_outdated(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get(SOURCE_KEY) != recipe.image.name
+    )
+
+
+def render_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        variant = variant.convert('RGB')
+        variant.save(buffer, image_format, quality=IMAGE_VARIANT_QUALITY,
+                     optimize=True, progressive=True)
+    else:
+        variant.save(buffer, image_format, optimize=True)
+    return buffer.getvalue()
+
+
+def generate_variants(recipe):
+    """Создаёт копии изображения рецепта и возвращает их имена."""
+    storage = recipe.image.storage
+    field = recipe._meta.get_field('image')
+    root, ext = os.path.splitext(os.path.basename(recipe.image.name))
+    with recipe.image.open('rb') as file:
+        image = Image.open(file)
+        image_format = image.format or 'JPEG'
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    variants = {SOURCE_KEY: recipe.image.name}
+    for variant, size in IMAGE_VARIANTS.items():
+        variants[variant] = storage.save(
+            field.generate_filename(recipe, f'{root}_{variant}{ext}'),
+            ContentFile(render_variant(image, size, image_format))
+        )
+    return variants
+
+
+def delete_variants(storage, variants):
+    for variant, name in variants.items():
+        if variant != SOURCE_KEY:
+            storage.delete(name)
+
+
+def update_variants(recipe, force=False):
+    """Перестраивает копии, если изображение рецепта сменилось."""
+    if not recipe.image or not (force or variants_outdated(recipe)):
+        return False
+    old_variants = recipe.image_variants
+    recipe.image_variants = generate_variants(recipe)
+    type(recipe).objects.filter(pk=recipe.pk).update(
+        image_variants=recipe.image_variants
+    )
+    # При откате транзакции строка продолжит ссылаться на старые копии
+    storage = recipe.image.storage
+    transaction.on_commit(lambda: delete_variants(storage, old_variants))
+    return True
+
+
+def variant_name(recipe, variant):
+    """Имя файла копии или оригинала, если копий ещё нет."""
+    if variant and not variants_outdated(recipe):
+        return recipe.image_variants.get(variant, recipe.image.name)
+    return recipe.image.name
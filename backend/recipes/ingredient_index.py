@@ -0,0 +1,86 @@
+import threading
+import time
+from bisect import bisect_left
+
+from core.constants import INGREDIENT_INDEX_CHECK_INTERVAL
+from core.versions import get_versions
+
+
+def normalize(value):
+    """Приводит строку к виду для поиска: регистр и ё/е не различаются."""
+    return value.strip().casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Индекс справочника ингредиентов в памяти процесса.
+
+    Ищет сначала по началу названия, затем по вхождению в середину.
+    Индекс строится лениво при первом обращении и перестраивается после
+    изменения ингредиентов: в своём процессе сразу по сигналу, в других
+    процессах после смены версии ingredients в общем кеше.
+    """
+
+    def __init__(self, check_interval=INGREDIENT_INDEX_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self._checked_at = 0
+
+    def _build(self):
+        from recipes.models import Ingredient
+
+        rows = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda row: (normalize(row['name']), row['id'])
+        )
+        keys = [normalize(row['name']) for row in rows]
+        by_id = {row['id']: row for row in rows}
+        return rows, keys, by_id
+
+    def _get_data(self):
+        now = time.monotonic()
+        # Одно чтение без блокировки: invalidate() может обнулить _data
+        # между проверкой и возвратом
+        data = self._data
+        if data is not None and now - self._checked_at < self.check_interval:
+            return data
+        with self._lock:
+            version = get_versions(('ingredients',))['ingredients']
+            if self._data is None or version != self._version:
+                self._data = self._build()
+                self._version = version
+            self._checked_at = now
+            return self._data
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+
+    def all(self):
+        return self._get_data()[0]
+
+    def get(self, pk):
+        return self._get_data()[2].get(pk)
+
+    def search(self, query, limit):
+        rows, keys, _ = self._get_data()
+        query = normalize(query)
+        if not query:
+            return rows[:limit]
+        result = []
+        start = bisect_left(keys, query)
+        for position in range(start, len(keys)):
+            if len(result) >= limit or not keys[position].startswith(query):
+                break
+            result.append(rows[position])
+        if len(result) < limit:
+            for key, row in zip(keys, rows):
+                if query in key and not key.startswith(query):
+                    result.append(row)
+                    if len(result) >= limit:
+                        break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,141 @@
+"""Пакетная идемпотентная загрузка справочников из CSV.
+
+Файл читается потоково пачками. Для каждой пачки одним запросом
+читаются существующие записи, новые вставляются через bulk_create,
+изменённые обновляются через bulk_update. Контрольная сумма файла
+сохраняется в CatalogueImport, и повторная загрузка того же файла
+ничего не делает.
+"""
+import csv
+import hashlib
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+
+from core.constants import CATALOGUE_CHUNK_SIZE
+from core.versions import bump_versions
+from recipes.ingredient_index import ingredient_index
+from recipes.models import CatalogueImport, Ingredient, Tag
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_chunks(path, chunk_size):
+    with open(path, 'r', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+class CatalogueLoader:
+    """Загрузчик справочника вида «ключ, значение».
+
+    model — модель справочника, key_field — поле, по которому строки
+    файла сопоставляются с записями, value_field — обновляемое поле.
+    """
+
+    def __init__(self, model, key_field, value_field, source,
+                 chunk_size=CATALOGUE_CHUNK_SIZE):
+        self.model = model
+        self.key_field = key_field
+        self.value_field = value_field
+        self.source = source
+        self.chunk_size = chunk_size
+
+    def load(self, path, force=False):
+        """Загружает файл и возвращает статистику.
+
+        Возвращает None, если файл не менялся с прошлой загрузки.
+        """
+        checksum = file_checksum(path)
+        if not force and CatalogueImport.objects.filter(
+            source=self.source, checksum=checksum
+        ).exists():
+            return None
+        stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': []}
+        changed_pks = []
+        for number, chunk in enumerate(read_chunks(path, self.chunk_size)):
+            try:
+                changed_pks.extend(self.load_chunk(chunk, stats))
+            except IntegrityError as error:
+                stats['errors'].append(
+                    f'пачка {number + 1} (строки '
+                    f'{number * self.chunk_size + 1}-'
+                    f'{number * self.chunk_size + len(chunk)}): {error}'
+                )
+        if not stats['errors']:
+            CatalogueImport.objects.update_or_create(
+                source=self.source, defaults={'checksum': checksum}
+            )
+        if changed_pks:
+            self.after_load(changed_pks)
+        return stats
+
+    @transaction.atomic
+    def load_chunk(self, chunk, stats):
+        # Внутри пачки побеждает последняя строка с тем же ключом
+        rows = {row[0]: row[1] for row in chunk if len(row) >= 2}
+        existing = {
+            key: (pk, value)
+            for pk, key, value in self.model.objects.filter(
+                **{f'{self.key_field}__in': rows}
+            ).values_list('pk', self.key_field, self.value_field)
+        }
+        new_objects = []
+        changed_objects = []
+        for key, value in rows.items():
+            if key not in existing:
+                new_objects.append(self.model(
+                    **{self.key_field: key, self.value_field: value}
+                ))
+            elif existing[key][1] != value:
+                changed_objects.append(self.model(
+                    pk=existing[key][0], **{self.value_field: value}
+                ))
+        self.model.objects.bulk_create(new_objects)
+        self.model.objects.bulk_update(changed_objects, (self.value_field,))
+        stats['inserted'] += len(new_objects)
+        stats['updated'] += len(changed_objects)
+        stats['unchanged'] += (
+            len(rows) - len(new_objects) - len(changed_objects)
+        )
+        return [obj.pk for obj in new_objects + changed_objects]
+
+    def after_load(self, changed_pks):
+        """Вызывается после загрузки с pk добавленных и изменённых записей.
+
+        bulk-операции не отправляют сигналы моделей, поэтому зависимые
+        кеши сбрасываются здесь.
+        """
+
+
+class IngredientLoader(CatalogueLoader):
+    def __init__(self, **kwargs):
+        super().__init__(
+            Ingredient, 'name', 'measurement_unit', 'ingredients', **kwargs
+        )
+
+    def after_load(self, changed_pks):
+        ingredient_index.invalidate()
+        bump_versions(['ingredients', 'recipes'] + [
+            f'ingredient:{pk}' for pk in changed_pks if pk is not None
+        ])
+
+
+class TagLoader(CatalogueLoader):
+    def __init__(self, **kwargs):
+        super().__init__(Tag, 'name', 'slug', 'tags', **kwargs)
+
+    def after_load(self, changed_pks):
+        bump_versions(['tags', 'recipes'] + [
+            f'tag:{pk}' for pk in changed_pks if pk is not None
+        ])
@@ -0,0 +1,49 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class CatalogueCommand(BaseCommand):
+    """Общая часть команд загрузки справочников из CSV."""
+    loader_class = None
+    default_filename = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(
+                settings.BASE_DIR, 'data', self.default_filename
+            ),
+            help='Путь к CSV-файлу'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Количество строк в одной пачке'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Загрузить файл, даже если он не менялся'
+        )
+
+    def handle(self, *args, **options):
+        loader_kwargs = {}
+        if options['chunk_size']:
+            loader_kwargs['chunk_size'] = options['chunk_size']
+        path = options['path']
+        stats = self.loader_class(**loader_kwargs).load(
+            path, force=options['force']
+        )
+        filename = os.path.basename(path)
+        if stats is None:
+            self.stdout.write(self.style.SUCCESS(
+                f'Файл {filename} не изменился, загрузка пропущена'
+            ))
+            return
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(f'Ошибка: {error}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Файл {filename} обработан: добавлено {stats["inserted"]}, '
+            f'обновлено {stats["updated"]}, '
+            f'без изменений {stats["unchanged"]}'
+        ))
@@ -0,0 +1,270 @@
+import random
+from io import BytesIO
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from core.storage import rebuild_references
+from core.versions import bump_versions
+from recipes import images
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    Tag,
+    UserFavourite,
+    UserShoppingCart
+)
+from users.models import Subscription
+
+User = get_user_model()
+
+PREFIX = 'fake'
+PASSWORD = 'fake-password'
+
+
+class ZipfSampler:
+    """Выбор элементов с вероятностью, убывающей как 1 / rank ** exponent.
+
+    Ранги раздаются элементам в случайном порядке, поэтому популярность
+    не зависит от id.
+    """
+
+    def __init__(self, population, exponent, rng):
+        self.rng = rng
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent
+            for rank in range(1, len(self.population) + 1)
+        ))
+
+    def sample(self, k):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=k
+        )
+
+    def distinct(self, k, exclude=None, attempts=4):
+        """До k разных элементов: у самых популярных много повторов."""
+        chosen = set()
+        for _ in range(attempts):
+            chosen.update(self.sample(2 * (k - len(chosen))))
+            chosen.discard(exclude)
+            if len(chosen) >= k:
+                break
+        return sorted(chosen)[:k]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Генерация больших объёмов тестовых данных: пользователей, '
+            'рецептов, избранного, корзин и подписок с неравномерной '
+            '(по закону Ципфа) популярностью. Результат определяется '
+            'параметром --seed. Ингредиенты берутся из справочника, '
+            'поэтому сначала выполните load_ingredient.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=10000,
+            help='Количество пользователей'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=100000,
+            help='Количество рецептов'
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8,
+            help='Количество ингредиентов в рецепте'
+        )
+        parser.add_argument(
+            '--tags', type=int, default=10,
+            help='Количество тегов, если их ещё нет'
+        )
+        parser.add_argument(
+            '--tags-per-recipe', type=int, default=2,
+            help='Количество тегов у рецепта'
+        )
+        parser.add_argument(
+            '--favourites', type=int, default=1000000,
+            help='Количество добавлений в избранное'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=100000,
+            help='Количество добавлений в корзину'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=200000,
+            help='Количество подписок'
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Показатель распределения популярности'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Начальное значение генератора случайных чисел'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Количество строк в одном INSERT'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.exponent = options['exponent']
+        self.batch_size = options['batch_size']
+        ingredient_ids = list(Ingredient.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        if not ingredient_ids:
+            raise CommandError('Справочник ингредиентов пуст')
+        tag_ids = self.ensure_tags(options['tags'])
+        start_user = User.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        start_recipe = Recipe.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+        self.insert(User, self.users(options['users']))
+        user_ids = list(User.objects.filter(pk__gt=start_user).order_by(
+            'pk'
+        ).values_list('pk', flat=True))
+        self.insert(Recipe, self.recipes(options['recipes'], user_ids))
+        recipe_ids = list(Recipe.objects.filter(
+            pk__gt=start_recipe
+        ).order_by('pk').values_list('pk', flat=True))
+        self.insert(RecipeIngredient, self.recipe_ingredients(
+            recipe_ids, ingredient_ids, options['ingredients_per_recipe']
+        ))
+        self.insert(Recipe.tags.through, self.recipe_tags(
+            recipe_ids, tag_ids, options['tags_per_recipe']
+        ))
+        self.insert(UserFavourite, self.user_recipes(
+            UserFavourite, user_ids, recipe_ids, options['favourites']
+        ))
+        self.insert(UserShoppingCart, self.user_recipes(
+            UserShoppingCart, user_ids, recipe_ids, options['carts']
+        ))
+        self.insert(Subscription, self.subscriptions(
+            user_ids, options['subscriptions']
+        ))
+        self.finish(recipe_ids)
+
+    def insert(self, model, objects):
+        created = 0
+        for batch in batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+        self.stdout.write(f'{model._meta.db_table}: {created}')
+
+    def ensure_tags(self, count):
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=f'{PREFIX} {number}', slug=f'{PREFIX}-{number}')
+                for number in range(count)
+            )
+        return list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+
+    def users(self, count):
+        password = make_password(PASSWORD)
+        number = User.objects.count()
+        for offset in range(count):
+            username = f'{PREFIX}{number + offset}'
+            yield User(
+                username=username,
+                email=f'{username}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+                password=password,
+            )
+
+    def recipes(self, count, user_ids):
+        image = self.sample_image()
+        authors = ZipfSampler(user_ids, self.exponent, self.rng)
+        for number, author_id in enumerate(authors.sample(count)):
+            yield Recipe(
+                name=f'Рецепт {number}',
+                text=f'Описание рецепта {number}',
+                cooking_time=self.rng.randint(5, 180),
+                image=image,
+                author_id=author_id,
+            )
+
+    def recipe_ingredients(self, recipe_ids, ingredient_ids, per_recipe):
+        ingredients = ZipfSampler(ingredient_ids, self.exponent, self.rng)
+        for recipe_id in recipe_ids:
+            for ingredient_id in ingredients.distinct(per_recipe):
+                yield RecipeIngredient(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=self.rng.randint(1, 500),
+                )
+
+    def recipe_tags(self, recipe_ids, tag_ids, per_recipe):
+        through = Recipe.tags.through
+        tags = ZipfSampler(tag_ids, self.exponent, self.rng)
+        for recipe_id in recipe_ids:
+            for tag_id in tags.distinct(per_recipe):
+                yield through(recipe_id=recipe_id, tag_id=tag_id)
+
+    def activity(self, user_ids, total):
+        """Сколько связей создаёт каждый пользователь: активных мало."""
+        users = ZipfSampler(user_ids, self.exponent, self.rng)
+        counts = {}
+        for user_id in users.sample(total):
+            counts[user_id] = counts.get(user_id, 0) + 1
+        return sorted(counts.items())
+
+    def user_recipes(self, model, user_ids, recipe_ids, total):
+        recipes = ZipfSampler(recipe_ids, self.exponent, self.rng)
+        for user_id, count in self.activity(user_ids, total):
+            for recipe_id in recipes.distinct(count):
+                yield model(user_id=user_id, recipe_id=recipe_id)
+
+    def subscriptions(self, user_ids, total):
+        authors = ZipfSampler(user_ids, self.exponent, self.rng)
+        for user_id, count in self.activity(user_ids, total):
+            for author_id in authors.distinct(count, exclude=user_id):
+                yield Subscription(
+                    subscriber_id=user_id, subscribed_to_id=author_id
+                )
+
+    def sample_image(self):
+        buffer = BytesIO()
+        Image.new('RGB', (1280, 960), 'orange').save(buffer, 'JPEG')
+        storage = Recipe._meta.get_field('image').storage
+        return storage.save(
+            f'recipes/images/{PREFIX}.jpg', ContentFile(buffer.getvalue())
+        )
+
+    def finish(self, recipe_ids):
+        """Досчитывает то, что при bulk_create не обновили сигналы."""
+        if recipe_ids:
+            recipe = Recipe.objects.get(pk=recipe_ids[0])
+            images.update_variants(recipe)
+            for batch in batched(recipe_ids, self.batch_size):
+                Recipe.objects.filter(pk__in=batch).update(
+                    image_variants=recipe.image_variants
+                )
+        # Одно изображение и его копии назначены всем рецептам разом
+        rebuild_references()
+        call_command('reconcile_counters', batch_size=self.batch_size)
+        call_command('rebuild_cart_totals')
+        call_command('update_search_vectors')
+        bump_versions(('tags', 'ingredients', 'recipes'))
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.versions import bump_versions
+from recipes import images
+from recipes.models import Recipe
+
+
+def process(recipe, force):
+    try:
+        return images.update_variants(recipe, force=force)
+    finally:
+        # Каждый поток открывает своё соединение с базой
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Создание уменьшенных копий изображений для существующих '
+            'рецептов в несколько потоков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Количество потоков'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько рецептов одновременно передаётся потокам'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать копии, даже если они актуальны'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').only(
+            'pk', 'image', 'image_variants'
+        ).iterator()
+        created = failed = 0
+        updated_ids = []
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            # Рецепты передаются пачками, чтобы не держать в памяти
+            # задачи для всей таблицы
+            while True:
+                batch = list(islice(recipes, options['batch_size']))
+                if not batch:
+                    break
+                futures = {
+                    executor.submit(process, recipe, options['force']): recipe
+                    for recipe in batch
+                }
+                for future in as_completed(futures):
+                    recipe = futures[future]
+                    try:
+                        if future.result():
+                            created += 1
+                            updated_ids.append(recipe.pk)
+                    except Exception as error:
+                        failed += 1
+                        self.stdout.write(self.style.WARNING(
+                            f'Рецепт id={recipe.pk}: {error}'
+                        ))
+        if updated_ids:
+            bump_versions(
+                ['recipes'] + [f'recipe:{pk}' for pk in updated_ids]
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Копии созданы для {created} рецептов, ошибок: {failed}'
+        ))
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import shopping_cart
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Пересчёт таблицы итогов корзин по рецептам в корзинах. '
+            'С флагом --verify только сверяет таблицу с живым агрегатом, '
+            'с флагом --missing заполняет итоги только тем, у кого их нет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить расхождения, ничего не меняя'
+        )
+        parser.add_argument(
+            '--missing', action='store_true',
+            help=('Заполнить итоги только для корзин без итогов, например '
+                  'собранных до появления таблицы итогов')
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Количество пользователей в одной пачке'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if options['missing']:
+            user_ids = list(shopping_cart.users_without_totals())
+        else:
+            user_ids = list(User.objects.order_by('pk').values_list(
+                'pk', flat=True
+            ))
+        mismatched = 0
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            if not options['verify']:
+                shopping_cart.rebuild_totals(batch)
+                continue
+            live = shopping_cart.live_totals(batch)
+            stored = shopping_cart.stored_totals(batch)
+            for user_id in batch:
+                if live.get(user_id, {}) != stored.get(user_id, {}):
+                    mismatched += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'Расхождение в корзине пользователя id={user_id}'
+                    ))
+        if options['verify']:
+            if mismatched:
+                raise CommandError(
+                    f'Итоги не совпадают у {mismatched} пользователей'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                'Итоги корзин совпадают с живым агрегатом'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Итоги корзин пересчитаны для {len(user_ids)} пользователей'
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import COUNTERS, reconcile
+
+
+class Command(BaseCommand):
+    help = ('Сверка денормализованных счётчиков рецептов и пользователей '
+            'с реальными данными и исправление расхождений пачками.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество объектов в одной пачке'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, field, related_model, fk_field in COUNTERS:
+            pks = list(model.objects.order_by('pk').values_list(
+                'pk', flat=True
+            ))
+            repaired = 0
+            for start in range(0, len(pks), batch_size):
+                repaired += reconcile(
+                    model, field, related_model, fk_field,
+                    pks[start:start + batch_size]
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}.{field}: '
+                f'исправлено {repaired} из {len(pks)}'
+            ))
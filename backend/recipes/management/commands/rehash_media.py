@@ -0,0 +1,77 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.storage import (
+    add_reference,
+    content_hash,
+    hashed_name,
+    rebuild_references
+)
+from core.versions import bump_versions
+from recipes import images
+from recipes.models import Recipe
+
+User = get_user_model()
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}\.\w+$')
+
+
+def rehash(instance, field_name):
+    """Переносит файл под имя из хеша содержимого, возвращает новое имя."""
+    file = getattr(instance, field_name)
+    old_name = file.name
+    if not old_name or HASHED_NAME.search(old_name):
+        return None
+    storage = file.storage
+    with storage.open(old_name, 'rb') as content:
+        new_name = hashed_name(old_name, content_hash(content))
+        if storage.exists(new_name):
+            add_reference(new_name)
+        else:
+            new_name = storage.save(old_name, content)
+    type(instance).objects.filter(pk=instance.pk).update(
+        **{field_name: new_name}
+    )
+    setattr(instance, field_name, new_name)
+    # Старый файл удаляется, только если на него больше никто не ссылается
+    storage.delete(old_name)
+    return new_name
+
+
+class Command(BaseCommand):
+    help = ('Перенос загруженных ранее аватаров и изображений рецептов '
+            'под имена из хеша содержимого с удалением дубликатов. '
+            'Перед переносом таблица ссылок на файлы пересчитывается '
+            'по всем записям.')
+
+    def handle(self, *args, **options):
+        references = rebuild_references()
+        self.stdout.write(f'Файлов со ссылками: {len(references)}')
+        avatars = 0
+        recipe_ids = []
+        for user in User.objects.exclude(avatar='').exclude(
+            avatar__isnull=True
+        ).only('pk', 'avatar').iterator():
+            if rehash(user, 'avatar'):
+                avatars += 1
+                # Аватар автора входит в закешированные карточки рецептов
+                recipe_ids.extend(user.recipes.values_list('pk', flat=True))
+        rehashed = 0
+        for recipe in Recipe.objects.exclude(image='').only(
+            'pk', 'image', 'image_variants'
+        ).iterator():
+            if rehash(recipe, 'image'):
+                # Имя оригинала сменилось — копии пересоздаются под хешами
+                images.update_variants(recipe)
+                recipe_ids.append(recipe.pk)
+                rehashed += 1
+        if recipe_ids:
+            bump_versions(
+                ['recipes'] + [f'recipe:{pk}' for pk in recipe_ids]
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено аватаров: {avatars}, '
+            f'изображений рецептов: {rehashed}'
+        ))
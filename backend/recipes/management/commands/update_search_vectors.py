@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.constants import SEARCH_VECTOR_CHUNK_SIZE
+from recipes.search import update_all_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт векторов полнотекстового поиска для всех рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=SEARCH_VECTOR_CHUNK_SIZE,
+            help='Количество рецептов в одном UPDATE'
+        )
+
+    def handle(self, *args, **options):
+        updated = update_all_search_vectors(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Векторы поиска пересчитаны для {updated} рецептов'
+        ))
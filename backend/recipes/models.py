@@ -1,15 +1,23 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
 from core.constants import (
+    MAX_LENGTH_CATALOGUE_SOURCE,
+    MAX_LENGTH_CHECKSUM,
     MAX_LENGTH_INGREDIENTS_NAME,
     MAX_LENGTH_INGREDIENTS_UNIT,
+    MAX_LENGTH_MEDIA_NAME,
     MAX_LENGTH_RECIPE_NAME,
     MAX_LENGTH_TAG_CHAR,
     MIN_AMOUNT,
-    MIN_COOKING_TIME
+    MIN_COOKING_TIME,
+    SHORT_LINK_CODE_LENGTH
 )
+from core.mixins import DenormalizedFieldsMixin
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -66,7 +74,9 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(DenormalizedFieldsMixin, models.Model):
+    denormalized_fields = ('favourite_count', 'cart_count', 'search_vector')
+
     name = models.CharField(
         blank=False,
         null=False,
@@ -90,11 +100,18 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/images/',
+        storage=ContentAddressedStorage(),
         blank=False,
         null=False,
         verbose_name='Изображение рецепта',
         help_text='Обязательное поле. Изображение рецепта.',
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         through='RecipeIngredient',  # Промежуточную модель
@@ -104,18 +121,46 @@ class Recipe(models.Model):
         User,
         on_delete=models.CASCADE,
         verbose_name='Автор',
-        related_name='recipes'
+        related_name='recipes',
+        # Поиск по автору обслуживает индекс recipe_author_id_idx
+        db_index=False,
     )
     tags = models.ManyToManyField(
         Tag,
         verbose_name='Теги',
     )
+    favourite_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    cart_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в корзину',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Вектор поиска',
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ('name',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
+        indexes = (
+            models.Index(
+                fields=('author', '-id'), name='recipe_author_id_idx'
+            ),
+            GinIndex(fields=('search_vector',), name='recipe_search_idx'),
+            GinIndex(
+                fields=('name',),
+                name='recipe_name_trgm_idx',
+                opclasses=('gin_trgm_ops',),
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -126,6 +171,8 @@ class RecipeIngredient(models.Model):
         Recipe,
         on_delete=models.CASCADE,
         verbose_name='Рецепт',
+        # Поиск по рецепту обслуживает составной уникальный индекс
+        db_index=False,
     )
     ingredient = models.ForeignKey(
         Ingredient,
@@ -144,11 +191,10 @@ class RecipeIngredient(models.Model):
     )
 
     class Meta:
-        ordering = ('recipe',)
         verbose_name = 'Соответствие ингредиента и рецепта'
         verbose_name_plural = 'Соответствие ингредиентов и рецептов'
         default_related_name = 'recipe_ingredients'
-        unique_together = ('ingredient', 'recipe')
+        unique_together = ('recipe', 'ingredient')
 
     def __str__(self):
         return f'{self.recipe.name} - {self.ingredient.name} ({self.amount})'
@@ -159,6 +205,8 @@ class BaseFavouriteShoppingCart(models.Model):
         User,
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
+        # Поиск по пользователю обслуживает составной уникальный индекс
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -168,19 +216,118 @@ class BaseFavouriteShoppingCart(models.Model):
 
     class Meta:
         abstract = True
-        ordering = ('user__username',)
         unique_together = ('user', 'recipe')
 
 
 class UserFavourite(BaseFavouriteShoppingCart):
-    class Meta:
+    class Meta(BaseFavouriteShoppingCart.Meta):
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
         default_related_name = 'user_favourite'
 
 
 class UserShoppingCart(BaseFavouriteShoppingCart):
-    class Meta:
+    class Meta(BaseFavouriteShoppingCart.Meta):
         verbose_name = 'Корзина покупок'
         verbose_name_plural = 'Корзины покупок'
         default_related_name = 'user_shopping_cart'
+
+
+class ShoppingCartIngredient(models.Model):
+    """Итоговое количество ингредиента в корзине пользователя.
+
+    Таблица поддерживается в актуальном состоянии функциями модуля
+    recipes.shopping_cart при изменении корзины и состава рецептов.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(
+        verbose_name='Общее количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзинах'
+        default_related_name = 'shopping_cart_ingredients'
+        unique_together = ('user', 'ingredient')
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient} ({self.amount})'
+
+
+class CatalogueImport(models.Model):
+    """Контрольная сумма последнего загруженного файла справочника."""
+    source = models.CharField(
+        verbose_name='Справочник',
+        max_length=MAX_LENGTH_CATALOGUE_SOURCE,
+        unique=True,
+    )
+    checksum = models.CharField(
+        verbose_name='Контрольная сумма SHA-256',
+        max_length=MAX_LENGTH_CHECKSUM,
+    )
+    loaded_at = models.DateTimeField(
+        verbose_name='Время загрузки',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Загрузка справочника'
+        verbose_name_plural = 'Загрузки справочников'
+
+    def __str__(self):
+        return f'{self.source} ({self.loaded_at})'
+
+
+class ShortLink(models.Model):
+    """Короткая ссылка на рецепт."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_link',
+        verbose_name='Рецепт',
+    )
+    code = models.CharField(
+        verbose_name='Код',
+        max_length=SHORT_LINK_CODE_LENGTH,
+        unique=True,
+    )
+    hits = models.PositiveBigIntegerField(
+        verbose_name='Переходы',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self):
+        return f'{self.code} → {self.recipe}'
+
+
+class MediaFile(models.Model):
+    """Число ссылок на файл хранилища с адресацией по содержимому."""
+    name = models.CharField(
+        verbose_name='Имя файла',
+        max_length=MAX_LENGTH_MEDIA_NAME,
+        unique=True,
+    )
+    references = models.PositiveIntegerField(
+        verbose_name='Ссылок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
@@ -0,0 +1,100 @@
+"""Полнотекстовый и триграммный поиск рецептов в PostgreSQL.
+
+Вектор поиска хранится в Recipe.search_vector и пересчитывается после
+сохранения рецепта или переименования ингредиента, поэтому запрос
+только сравнивает готовый вектор по GIN-индексу. Опечатки ловит
+триграммный индекс по названию рецепта.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector
+)
+from django.db.models import (
+    F,
+    FloatField,
+    Func,
+    OuterRef,
+    Q,
+    Subquery,
+    Value
+)
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import PostgresOperatorLookup
+
+from core.constants import (
+    SEARCH_CONFIG,
+    SEARCH_TRIGRAM_WEIGHT,
+    SEARCH_VECTOR_CHUNK_SIZE
+)
+
+
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """Похожесть строки запроса на слова поля: name %> 'запрос'."""
+    lookup_name = 'trigram_word_similar'
+    postgres_operator = '%%>'
+
+
+class TrigramWordSimilarity(Func):
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        super().__init__(Value(string), expression, **extra)
+
+
+def search_vector():
+    """Выражение вектора: название, ингредиенты и описание рецепта."""
+    from recipes.models import RecipeIngredient
+
+    ingredient_names = RecipeIngredient.objects.filter(
+        recipe=OuterRef('pk')
+    ).values('recipe').annotate(
+        names=StringAgg('ingredient__name', delimiter=' ')
+    ).values('names')
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            Subquery(ingredient_names), weight='B', config=SEARCH_CONFIG
+        )
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids=None):
+    """Пересчитывает вектор поиска для рецептов, по умолчанию для всех."""
+    from recipes.models import Recipe
+
+    queryset = Recipe.objects.all()
+    if recipe_ids is not None:
+        queryset = queryset.filter(pk__in=recipe_ids)
+    return queryset.update(search_vector=search_vector())
+
+
+def update_all_search_vectors(chunk_size=SEARCH_VECTOR_CHUNK_SIZE):
+    """Пересчитывает векторы всех рецептов пачками по id."""
+    from recipes.models import Recipe
+
+    updated = last_id = 0
+    while True:
+        ids = list(Recipe.objects.filter(pk__gt=last_id).order_by(
+            'pk'
+        ).values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return updated
+        updated += update_search_vectors(ids)
+        last_id = ids[-1]
+
+
+def search_recipes(queryset, value):
+    """Фильтрует рецепты по запросу и сортирует по релевантности."""
+    query = SearchQuery(value, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(
+        Q(search_vector=query) | Q(name__trigram_word_similar=value)
+    ).annotate(
+        # Вектор нового рецепта заполняется после коммита, до этого
+        # рецепт ранжируется только по сходству названия
+        rank=Coalesce(SearchRank(F('search_vector'), query), 0.0)
+        + SEARCH_TRIGRAM_WEIGHT * TrigramWordSimilarity(value, 'name')
+    ).order_by('-rank', '-id')
@@ -0,0 +1,155 @@
+"""Поддержка таблицы итогов корзины ShoppingCartIngredient.
+
+Все изменения применяются приращениями F('amount') + delta в той же
+транзакции, что и изменение корзины или рецепта.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from core.versions import bump_versions
+from recipes.models import (
+    RecipeIngredient,
+    ShoppingCartIngredient,
+    UserShoppingCart
+)
+
+BULK_BATCH_SIZE = 1000
+
+
+def recipe_amounts(recipe_ids):
+    """Суммарное количество каждого ингредиента в указанных рецептах."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total').order_by()
+    )
+
+
+@transaction.atomic
+def apply_totals_delta(user_ids, deltas):
+    """Прибавляет deltas {ingredient_id: количество} к итогам пользователей.
+
+    Строки, у которых количество стало нулевым, удаляются.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=0
+            )
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items() if delta > 0
+        ),
+        batch_size=BULK_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    rows = list(ShoppingCartIngredient.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    ).only('pk', 'ingredient_id'))
+    for row in rows:
+        row.amount = F('amount') + deltas[row.ingredient_id]
+    ShoppingCartIngredient.objects.bulk_update(
+        rows, ('amount',), batch_size=BULK_BATCH_SIZE
+    )
+    ShoppingCartIngredient.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas, amount__lte=0
+    ).delete()
+    transaction.on_commit(
+        lambda: bump_versions([f'cart:{pk}' for pk in user_ids])
+    )
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_totals_delta((user_id,), recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    apply_totals_delta((user_id,), {
+        pk: -amount for pk, amount in recipe_amounts(recipe_ids).items()
+    })
+
+
+def recipe_ingredients_changed(recipe_id, old_amounts):
+    """Пересчитывает итоги корзин после правки состава рецепта.
+
+    old_amounts — состав рецепта {ingredient_id: количество} до правки.
+    """
+    deltas = defaultdict(int, recipe_amounts((recipe_id,)))
+    for ingredient_id, amount in old_amounts.items():
+        deltas[ingredient_id] -= amount
+    apply_totals_delta(
+        UserShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        deltas
+    )
+
+
+def live_totals(user_ids):
+    """Итоги корзин, посчитанные по исходным таблицам."""
+    totals = defaultdict(dict)
+    rows = RecipeIngredient.objects.filter(
+        recipe__user_shopping_cart__user_id__in=user_ids
+    ).values(
+        'recipe__user_shopping_cart__user_id', 'ingredient_id'
+    ).annotate(total=Sum('amount')).order_by()
+    for row in rows:
+        user_id = row['recipe__user_shopping_cart__user_id']
+        totals[user_id][row['ingredient_id']] = row['total']
+    return totals
+
+
+def stored_totals(user_ids):
+    totals = defaultdict(dict)
+    rows = ShoppingCartIngredient.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'ingredient_id', 'amount')
+    for user_id, ingredient_id, amount in rows:
+        totals[user_id][ingredient_id] = amount
+    return totals
+
+
+def users_without_totals():
+    """Пользователи с рецептами в корзине, но без строк итогов.
+
+    Так выглядят корзины, собранные до появления таблицы итогов.
+    """
+    return UserShoppingCart.objects.exclude(
+        user_id__in=ShoppingCartIngredient.objects.values('user_id')
+    ).values_list('user_id', flat=True).distinct().order_by('user_id')
+
+
+def restore_totals(user_id):
+    """Строит итоги пользователя без строк итогов, если корзина не пуста.
+
+    Возвращает True, если итоги построены.
+    """
+    if not UserShoppingCart.objects.filter(user_id=user_id).exists():
+        return False
+    rebuild_totals((user_id,))
+    return True
+
+
+@transaction.atomic
+def rebuild_totals(user_ids):
+    ShoppingCartIngredient.objects.filter(user_id__in=user_ids).delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for user_id, amounts in live_totals(user_ids).items()
+            for ingredient_id, amount in amounts.items()
+        ),
+        batch_size=BULK_BATCH_SIZE
+    )
+    transaction.on_commit(
+        lambda: bump_versions([f'cart:{pk}' for pk in user_ids])
+    )
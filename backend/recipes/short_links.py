@@ -0,0 +1,182 @@
+"""Короткие ссылки на рецепты.
+
+Код ссылки разрешается в id рецепта через LRU-кеш процесса, промах
+стоит одного запроса по уникальному индексу. Запись кеша хранит
+версию рецепта (core.versions): удаление рецепта в любом процессе
+меняет версию, и запись перестаёт действовать во всех процессах.
+Переходы копятся в памяти и записываются в базу пачками из фонового
+потока, поэтому редирект не ждёт записи.
+"""
+import atexit
+import base64
+import binascii
+import logging
+import secrets
+import string
+import threading
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+
+from core.constants import (
+    SHORT_LINK_CACHE_SIZE,
+    SHORT_LINK_CACHE_TTL,
+    SHORT_LINK_CODE_ATTEMPTS,
+    SHORT_LINK_CODE_LENGTH,
+    SHORT_LINK_FLUSH_INTERVAL
+)
+from core.lru import LRUCache
+from core.versions import get_versions
+
+logger = logging.getLogger('backends')
+
+ALPHABET = string.ascii_letters + string.digits
+
+resolved_codes = LRUCache(SHORT_LINK_CACHE_SIZE, ttl=SHORT_LINK_CACHE_TTL)
+
+
+def generate_code():
+    return ''.join(
+        secrets.choice(ALPHABET) for _ in range(SHORT_LINK_CODE_LENGTH)
+    )
+
+
+def legacy_code(recipe_id):
+    return base64.urlsafe_b64encode(str(recipe_id).encode()).decode()
+
+
+def decode_legacy_code(code):
+    try:
+        return int(base64.urlsafe_b64decode(code.encode()).decode())
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+
+
+def get_code(recipe):
+    """Возвращает код ссылки на рецепт, создавая её при необходимости."""
+    from recipes.models import ShortLink
+
+    link = ShortLink.objects.filter(recipe=recipe).only('code').first()
+    if link:
+        return link.code
+    for _ in range(SHORT_LINK_CODE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                link, _ = ShortLink.objects.get_or_create(
+                    recipe=recipe, defaults={'code': generate_code()}
+                )
+            return link.code
+        except IntegrityError:
+            # Совпал код другой ссылки — пробуем новый
+            continue
+    raise IntegrityError('Не удалось подобрать свободный код ссылки')
+
+
+def recipe_version(recipe_id):
+    key = f'recipe:{recipe_id}'
+    return get_versions((key,))[key]
+
+
+def resolve(code):
+    """Возвращает id рецепта по коду ссылки или None."""
+    from recipes.models import Recipe, ShortLink
+
+    cached = resolved_codes.get(code)
+    if cached is not None:
+        recipe_id, version = cached
+        if recipe_version(recipe_id) == version:
+            return recipe_id
+    recipe_id = ShortLink.objects.filter(code=code).values_list(
+        'recipe_id', flat=True
+    ).first()
+    if recipe_id is None:
+        # Ссылки старого формата содержат id рецепта в base64
+        recipe_id = decode_legacy_code(code)
+        if recipe_id is None or not Recipe.objects.filter(
+            pk=recipe_id
+        ).exists():
+            return None
+    resolved_codes.set(code, (recipe_id, recipe_version(recipe_id)))
+    return recipe_id
+
+
+def forget(recipe_id, code=None):
+    """Убирает из кеша коды удалённого рецепта."""
+    resolved_codes.pop(legacy_code(recipe_id))
+    if code:
+        resolved_codes.pop(code)
+
+
+class HitBuffer:
+    """Счётчики переходов по ссылкам, сбрасываемые в базу пачками."""
+
+    def __init__(self, interval=SHORT_LINK_FLUSH_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._hits = Counter()
+        self._thread = None
+
+    def add(self, recipe_id):
+        with self._lock:
+            self._hits[recipe_id] += 1
+            if self._thread is None:
+                self._start()
+
+    def _start(self):
+        self._thread = threading.Thread(
+            target=self._run, name='short-link-hits', daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Не удалось записать переходы по ссылкам')
+            finally:
+                connection.close()
+
+    def flush(self):
+        """Записывает накопленные переходы, возвращает их количество."""
+        from recipes.models import ShortLink
+
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+        if not hits:
+            return 0
+        self.create_missing_links(hits)
+        # Одно обновление на каждое встретившееся число переходов
+        by_count = defaultdict(list)
+        for recipe_id, count in hits.items():
+            by_count[count].append(recipe_id)
+        with transaction.atomic():
+            for count, recipe_ids in by_count.items():
+                ShortLink.objects.filter(recipe_id__in=recipe_ids).update(
+                    hits=F('hits') + count
+                )
+        return sum(hits.values())
+
+    @staticmethod
+    def create_missing_links(recipe_ids):
+        """Создаёт ссылки рецептам, на которые перешли по старому коду.
+
+        Без строки ShortLink переходы этих рецептов некуда записать.
+        """
+        from recipes.models import Recipe, ShortLink
+
+        existing = set(ShortLink.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True))
+        for recipe_id in set(recipe_ids) - existing:
+            try:
+                get_code(Recipe(pk=recipe_id))
+            except IntegrityError:
+                # Рецепт удалили, пока переходы копились в памяти
+                logger.warning('Нет рецепта %s для короткой ссылки', recipe_id)
+
+
+hit_buffer = HitBuffer()
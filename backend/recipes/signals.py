@@ -0,0 +1,184 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.versions import bump_versions
+from recipes import images, search, shopping_cart, short_links
+from recipes.counters import RECIPE_COUNTERS, change_counter
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShortLink,
+    Tag,
+    UserFavourite,
+    UserShoppingCart
+)
+from recipes.tag_slugs import tag_slugs
+from users.models import Subscription
+
+User = get_user_model()
+
+
+def bump_versions_on_commit(keys):
+    keys = list(keys)
+    transaction.on_commit(lambda: bump_versions(keys))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, instance, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+    bump_versions_on_commit(
+        ('ingredients', f'ingredient:{instance.pk}', 'recipes')
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_vectors(sender, instance, created, **kwargs):
+    if created:
+        return
+    recipe_ids = RecipeIngredient.objects.filter(
+        ingredient=instance
+    ).values('recipe_id')
+    transaction.on_commit(lambda: search.update_search_vectors(recipe_ids))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tag_versions(sender, instance, **kwargs):
+    transaction.on_commit(tag_slugs.invalidate)
+    bump_versions_on_commit(('tags', f'tag:{instance.pk}', 'recipes'))
+
+
+@receiver(post_save, sender=Recipe)
+def update_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.update_variants(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, **kwargs):
+    # Ингредиенты сохраняются после рецепта, поэтому вектор
+    # пересчитывается после завершения транзакции
+    recipe_ids = (instance.pk,)
+    transaction.on_commit(lambda: search.update_search_vectors(recipe_ids))
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_legacy_short_link(sender, instance, **kwargs):
+    short_links.forget(instance.pk)
+
+
+@receiver(post_delete, sender=ShortLink)
+def forget_short_link(sender, instance, **kwargs):
+    short_links.forget(instance.recipe_id, instance.code)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_images(sender, instance, **kwargs):
+    names = [instance.image.name] + [
+        name for variant, name in instance.image_variants.items()
+        if variant != images.SOURCE_KEY
+    ]
+    storage = instance.image.storage
+    transaction.on_commit(lambda: [storage.delete(name) for name in names])
+
+
+@receiver(post_delete, sender=User)
+def delete_user_avatar(sender, instance, **kwargs):
+    if instance.avatar:
+        name = instance.avatar.name
+        storage = instance.avatar.storage
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipe_versions(sender, instance, **kwargs):
+    bump_versions_on_commit(('recipes', f'recipe:{instance.pk}'))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def bump_recipe_ingredient_versions(sender, instance, **kwargs):
+    bump_versions_on_commit(('recipes', f'recipe:{instance.recipe_id}'))
+
+
+@receiver((post_save, post_delete), sender=UserFavourite)
+@receiver((post_save, post_delete), sender=UserShoppingCart)
+def bump_user_recipe_versions(sender, instance, **kwargs):
+    bump_versions_on_commit((
+        'recipes',
+        f'recipe:{instance.recipe_id}',
+        f'user:{instance.user_id}'
+    ))
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def bump_subscription_versions(sender, instance, **kwargs):
+    bump_versions_on_commit((f'user:{instance.subscriber_id}',))
+
+
+@receiver(post_save, sender=User)
+def bump_author_versions(sender, instance, created, update_fields, **kwargs):
+    # Вход в систему обновляет только last_login, на рецепты это не влияет
+    if created or update_fields == frozenset(('last_login',)):
+        return
+    recipe_ids = instance.recipes.values_list('pk', flat=True)
+    bump_versions_on_commit(
+        ['recipes'] + [f'recipe:{pk}' for pk in recipe_ids]
+    )
+
+
+@receiver(post_save, sender=UserShoppingCart)
+def add_to_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        shopping_cart.add_recipes(instance.user_id, (instance.recipe_id,))
+
+
+# pre_delete: при каскадном удалении рецепта его ингредиенты ещё на месте
+@receiver(pre_delete, sender=UserShoppingCart)
+def remove_from_cart_totals(sender, instance, **kwargs):
+    shopping_cart.remove_recipes(instance.user_id, (instance.recipe_id,))
+
+
+@receiver(post_save, sender=UserFavourite)
+@receiver(post_save, sender=UserShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe, RECIPE_COUNTERS[sender], (instance.recipe_id,), 1
+        )
+
+
+@receiver(post_delete, sender=UserFavourite)
+@receiver(post_delete, sender=UserShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    change_counter(Recipe, RECIPE_COUNTERS[sender], (instance.recipe_id,), -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_author_recipe_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, 'recipe_count', (instance.author_id,), 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_author_recipe_count(sender, instance, **kwargs):
+    change_counter(User, 'recipe_count', (instance.author_id,), -1)
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscription_counters(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User, 'subscriber_count', (instance.subscribed_to_id,), 1
+        )
+        change_counter(
+            User, 'subscription_count', (instance.subscriber_id,), 1
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscription_counters(sender, instance, **kwargs):
+    change_counter(User, 'subscriber_count', (instance.subscribed_to_id,), -1)
+    change_counter(User, 'subscription_count', (instance.subscriber_id,), -1)
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from core.constants import TAG_SLUGS_CHECK_INTERVAL
+from core.versions import get_versions
+
+
+class TagSlugs:
+    """Соответствие слагов тегов их id в памяти процесса.
+
+    Теги меняются редко, поэтому фильтр рецептов берёт допустимые слаги
+    отсюда, а не запросом к базе. Данные перечитываются после смены
+    версии tags в общем кеше, в своём процессе — сразу по сигналу.
+    """
+
+    def __init__(self, check_interval=TAG_SLUGS_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self._checked_at = 0
+
+    def _get_data(self):
+        from recipes.models import Tag
+
+        now = time.monotonic()
+        # Одно чтение без блокировки: invalidate() может обнулить _data
+        # между проверкой и возвратом
+        data = self._data
+        if data is not None and now - self._checked_at < self.check_interval:
+            return data
+        with self._lock:
+            version = get_versions(('tags',))['tags']
+            if self._data is None or version != self._version:
+                self._data = dict(Tag.objects.values_list('slug', 'id'))
+                self._version = version
+            self._checked_at = now
+            return self._data
+
+    def invalidate(self):
+        with self._lock:
+            self._data = None
+
+    def choices(self):
+        return [(slug, slug) for slug in sorted(self._get_data())]
+
+    def has_id(self, pk):
+        return pk in self._get_data().values()
+
+    def ids(self, slugs):
+        data = self._get_data()
+        return [data[slug] for slug in slugs if slug in data]
+
+
+tag_slugs = TagSlugs()
@@ -0,0 +1,154 @@
+import json
+from io import BytesIO
+
+import pytest
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.management.commands._api import LOCAL_CACHES
+from api.management.commands.explain_queries import plan_nodes
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    Tag,
+    UserFavourite,
+    UserShoppingCart
+)
+from recipes.tag_slugs import tag_slugs
+from users.models import Subscription, User
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, response.content
+    return len(context)
+
+
+def explain(sql, params=()):
+    """Узлы плана запроса PostgreSQL."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(plan_nodes(plan[0]['Plan']))
+
+
+@pytest.fixture(autouse=True)
+def local_settings(settings, tmp_path):
+    settings.CACHES = LOCAL_CACHES
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.ALLOWED_HOSTS = ['*']
+    caches['default'].clear()
+    # Справочники в памяти процесса не должны переживать откат базы
+    tag_slugs.invalidate()
+    ingredient_index.invalidate()
+
+
+@pytest.fixture
+def postgres(db):
+    if connection.vendor != 'postgresql':
+        pytest.skip('Нужен PostgreSQL')
+
+
+@pytest.fixture
+def no_seq_scan(postgres):
+    """Планировщик выбирает Seq Scan, только если индекс не подходит.
+
+    На маленькой тестовой базе полное сканирование дешевле любого
+    индекса, поэтому иначе по плану не понять, есть ли нужный индекс.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+
+
+@pytest.fixture
+def image():
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def users(db):
+    return [
+        User.objects.create_user(
+            email=f'user{number}@example.com', username=f'user{number}',
+            first_name='Имя', last_name='Фамилия', password='Pass-12345'
+        )
+        for number in range(4)
+    ]
+
+
+@pytest.fixture
+def user(users):
+    return users[0]
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('мука', 'сахар', 'яблоко', 'ёжевика')
+    ]
+
+
+@pytest.fixture
+def make_recipes(image, tags, ingredients):
+    def make(count, author, recipe_tags=None):
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}', text='Описание', cooking_time=10,
+                author=author, image=SimpleUploadedFile('image.png', image)
+            )
+            recipe.tags.set(tags[:2] if recipe_tags is None else recipe_tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=100)
+                for ingredient in ingredients[:3]
+            )
+            recipes.append(recipe)
+        return recipes
+    return make
+
+
+@pytest.fixture
+def catalogue(users, make_recipes):
+    """Рецепты трёх авторов; первый пользователь подписан на всех,
+    часть рецептов у него в избранном и в корзине."""
+    recipes = []
+    for author in users[1:]:
+        recipes += make_recipes(5, author)
+        Subscription.objects.create(subscriber=users[0], subscribed_to=author)
+    for recipe in recipes[::2]:
+        UserFavourite.objects.create(user=users[0], recipe=recipe)
+        UserShoppingCart.objects.create(user=users[0], recipe=recipe)
+    return recipes
+
+
+@pytest.fixture
+def guest_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
@@ -0,0 +1,27 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+
+from api.management.commands.benchmark_api import PERCENTILES
+
+
+def test_benchmark_baseline(catalogue, postgres, tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    call_command(
+        'benchmark_api', repeat=3, warmup=1, output=str(baseline),
+        stdout=StringIO()
+    )
+    results = json.loads(baseline.read_text(encoding='utf-8'))
+    assert {'recipes', 'recipe_detail', 'subscriptions',
+            'download_shopping_cart', 'recipe_create'} <= set(results)
+    for result in results.values():
+        assert result['queries'] > 0
+        timings = [result[f'p{percent}_ms'] for percent in PERCENTILES]
+        assert timings == sorted(timings)
+    # Повторный замер на тех же данных не добавляет запросов; порог по
+    # задержке широкий, чтобы шум машины не ронял тест
+    call_command(
+        'benchmark_api', repeat=3, warmup=1, compare=str(baseline),
+        threshold=10, stdout=StringIO()
+    )
@@ -0,0 +1,31 @@
+import pytest
+from django.core.cache import cache
+
+from core.versions import VERSION_KEY_PREFIX
+
+
+@pytest.mark.parametrize('url', (
+    '/api/recipes/{}/',
+    '/api/tags/{}/',
+    '/api/ingredients/{}/',
+))
+@pytest.mark.parametrize('pk', ('a%20b', '1' * 300, '999999'))
+def test_unknown_pk_is_not_found(url, pk, catalogue, guest_client):
+    response = guest_client.get(url.format(pk))
+    assert response.status_code == 404
+    assert not any(
+        key.startswith(VERSION_KEY_PREFIX)
+        and key.split(':')[-1] not in ('tags', 'ingredients')
+        for key in cache._cache
+    )
+
+
+def test_known_pk_is_not_modified(catalogue, tags, guest_client):
+    for url in (
+        f'/api/recipes/{catalogue[0].pk}/',
+        f'/api/tags/{tags[0].pk}/',
+    ):
+        etag = guest_client.get(url)['ETag']
+        assert guest_client.get(
+            url, HTTP_IF_NONE_MATCH=etag
+        ).status_code == 304
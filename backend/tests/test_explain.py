@@ -0,0 +1,33 @@
+from api.management.commands.explain_queries import Command
+from recipes.models import (
+    Recipe,
+    RecipeIngredient,
+    ShoppingCartIngredient,
+    UserFavourite,
+    UserShoppingCart
+)
+from users.models import Subscription
+
+# Таблицы, которые растут вместе с числом пользователей и рецептов
+LARGE_TABLES = {
+    model._meta.db_table for model in (
+        Recipe,
+        Recipe.tags.through,
+        RecipeIngredient,
+        ShoppingCartIngredient,
+        Subscription,
+        UserFavourite,
+        UserShoppingCart,
+    )
+}
+
+
+def test_endpoint_queries_use_indexes(catalogue, no_seq_scan):
+    command = Command()
+    failures = [
+        (url, table, sql)
+        for url, user, sql in command.capture_queries()
+        for table in command.seq_scans(sql)
+        if table in LARGE_TABLES
+    ]
+    assert failures == []
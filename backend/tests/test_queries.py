@@ -0,0 +1,56 @@
+import pytest
+
+from tests.conftest import count_queries
+
+# Списки и нужен ли для них вошедший пользователь
+LIST_URLS = (
+    ('/api/recipes/?limit={limit}', False),
+    ('/api/recipes/?limit={limit}&tags=tag0&tags=tag1', False),
+    ('/api/recipes/?limit={limit}&is_favorited=1', True),
+    ('/api/recipes/?limit={limit}&is_in_shopping_cart=1', True),
+    ('/api/users/?limit={limit}', False),
+    ('/api/users/subscriptions/?limit={limit}&recipes_limit=2', True),
+)
+
+
+@pytest.mark.parametrize('url, authenticated', LIST_URLS)
+def test_list_queries_do_not_depend_on_page_size(
+    url, authenticated, catalogue, guest_client, user_client
+):
+    clients = (user_client,) if authenticated else (guest_client, user_client)
+    for client in clients:
+        # Первый запрос заполняет справочники в памяти процесса
+        client.get(url.format(limit=1))
+        assert (
+            count_queries(client, url.format(limit=1))
+            == count_queries(client, url.format(limit=10))
+        )
+
+
+# Бюджет с запасом в один запрос: счётчик страниц на PostgreSQL
+# строится по плану запроса, на других базах — через COUNT
+@pytest.mark.parametrize('url, budget', (
+    ('/api/recipes/?limit=10', 5),
+    ('/api/recipes/?limit=10&tags=tag0&tags=tag1', 6),
+    ('/api/recipes/?limit=10&is_in_shopping_cart=1', 5),
+    ('/api/users/?limit=10', 3),
+    ('/api/users/subscriptions/?limit=10&recipes_limit=2', 4),
+    ('/api/ingredients/?name=му', 2),
+    ('/api/tags/', 2),
+))
+def test_list_query_budget(
+    url, budget, catalogue, user_client, django_assert_max_num_queries
+):
+    with django_assert_max_num_queries(budget):
+        response = user_client.get(url)
+    assert response.status_code == 200
+
+
+def test_recipe_detail_query_budget(
+    catalogue, user_client, django_assert_max_num_queries
+):
+    with django_assert_max_num_queries(4):
+        response = user_client.get(f'/api/recipes/{catalogue[0].pk}/')
+    assert response.status_code == 200
+    assert response.data['is_favorited'] is True
+    assert response.data['author']['is_subscribed'] is True
@@ -0,0 +1,100 @@
+import pytest
+
+from api.filters import RecipeFilter
+from recipes.models import Recipe, Tag
+from recipes.tag_slugs import tag_slugs
+from tests.conftest import count_queries, explain
+
+URL = '/api/recipes/?count=exact&limit=100'
+
+
+@pytest.fixture
+def tagged(user, tags, make_recipes):
+    first, second, third = tags
+    return {
+        'first': make_recipes(1, user, [first])[0],
+        'second': make_recipes(1, user, [second])[0],
+        'both': make_recipes(1, user, [first, second])[0],
+        'third': make_recipes(1, user, [third])[0],
+    }
+
+
+def result_ids(response):
+    assert response.status_code == 200, response.content
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_any_of_tags_without_duplicates(tagged, guest_client):
+    response = guest_client.get(f'{URL}&tags=tag0&tags=tag1')
+    ids = result_ids(response)
+    assert sorted(ids) == sorted(
+        tagged[name].pk for name in ('first', 'second', 'both')
+    )
+    assert response.data['count'] == len(ids)
+
+
+def test_single_tag(tagged, guest_client):
+    assert result_ids(guest_client.get(f'{URL}&tags=tag2')) == [
+        tagged['third'].pk
+    ]
+
+
+def test_unknown_tag_is_rejected(tagged, guest_client):
+    assert guest_client.get(f'{URL}&tags=missing').status_code == 400
+
+
+def test_new_tag_is_accepted(tagged, user, make_recipes, guest_client):
+    guest_client.get(f'{URL}&tags=tag0')
+    tag = Tag.objects.create(name='Новый', slug='new')
+    recipe = make_recipes(1, user, [tag])[0]
+    # В тестах on_commit не выполняется, справочник сбрасывается вручную
+    tag_slugs.invalidate()
+    assert result_ids(guest_client.get(f'{URL}&tags=new')) == [recipe.pk]
+
+
+@pytest.fixture
+def many_tags(user, make_recipes):
+    tags = [
+        Tag.objects.create(name=f'Много {number}', slug=f'many{number}')
+        for number in range(30)
+    ]
+    return tags, make_recipes(3, user, tags)
+
+
+def filtered(slugs):
+    return RecipeFilter(
+        {'tags': slugs}, queryset=Recipe.objects.order_by('-id')
+    ).qs
+
+
+def test_many_tags_without_join(many_tags):
+    tags, recipes = many_tags
+    queryset = filtered([tag.slug for tag in tags])
+    sql = str(queryset.query).upper()
+    assert 'JOIN' not in sql
+    assert 'DISTINCT' not in sql
+    assert sorted(queryset.values_list('pk', flat=True)) == sorted(
+        recipe.pk for recipe in recipes
+    )
+
+
+def test_many_tags_query_count(many_tags, guest_client):
+    tags, _ = many_tags
+    one_tag = f'{URL}&tags={tags[0].slug}'
+    all_tags = URL + ''.join(f'&tags={tag.slug}' for tag in tags)
+    guest_client.get(one_tag)
+    assert count_queries(guest_client, one_tag) == count_queries(
+        guest_client, all_tags
+    )
+
+
+def test_many_tags_plan_uses_index(many_tags, no_seq_scan):
+    tags, _ = many_tags
+    sql, params = filtered(
+        [tag.slug for tag in tags]
+    ).query.sql_with_params()
+    scanned = {
+        node.get('Relation Name') for node in explain(sql, params)
+        if node['Node Type'] == 'Seq Scan'
+    }
+    assert Recipe.tags.through._meta.db_table not in scanned
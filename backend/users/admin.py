@@ -11,13 +11,15 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name',
         'recipe_count',
+        'subscriber_count',
+        'subscription_count',
     )
     search_fields = ['username', 'email']
-
-    @admin.display(description='Всего рецептов')
-    def recipe_count(self, obj):
-        # Подсчитываем количество рецептов у пользователя
-        return obj.recipes.count()
+    readonly_fields = (
+        'recipe_count',
+        'subscriber_count',
+        'subscription_count',
+    )
 
 
 @admin.register(Subscription)
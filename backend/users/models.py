@@ -6,11 +6,17 @@ from django.core.exceptions import ValidationError
 from django.db import models
 
 from core.constants import MAX_LENGTH_EMAIL, MAX_LENGTH_USERS_CHAR
+from core.mixins import DenormalizedFieldsMixin
+from core.storage import ContentAddressedStorage
 
 logger = logging.getLogger('models')
 
 
-class User(AbstractUser):
+class User(DenormalizedFieldsMixin, AbstractUser):
+    denormalized_fields = (
+        'recipe_count', 'subscriber_count', 'subscription_count'
+    )
+
     username = models.CharField(
         verbose_name='Никнейм',
         max_length=MAX_LENGTH_USERS_CHAR,
@@ -47,10 +53,26 @@ class User(AbstractUser):
     avatar = models.ImageField(
         verbose_name='Аватар',
         upload_to='users/',  # Папка в MEDIA_ROOT для хранения аватаров
+        storage=ContentAddressedStorage(),
         help_text='Не обязательное поле. Загрузите аватар пользователя.',
         blank=True,
         default='',
     )
+    recipe_count = models.PositiveIntegerField(
+        verbose_name='Всего рецептов',
+        default=0,
+        editable=False,
+    )
+    subscriber_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
+    subscription_count = models.PositiveIntegerField(
+        verbose_name='Подписок',
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -71,6 +93,8 @@ class Subscription(models.Model):
         related_name='subscriptions',
         # Обратная связь: подписки пользователя
         verbose_name='Подписчик',
+        # Поиск по подписчику обслуживает составной уникальный индекс
+        db_index=False,
     )
     subscribed_to = models.ForeignKey(
         User,
@@ -84,6 +108,12 @@ class Subscription(models.Model):
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         unique_together = ('subscriber', 'subscribed_to')
+        indexes = (
+            # Подписки пользователя в порядке оформления
+            models.Index(
+                fields=('subscriber', 'id'), name='subscription_order_idx'
+            ),
+        )
 
     def clean(self):
         """Запрещаем подписку на самого себя."""